@@ -0,0 +1,337 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from constants import (MAX_FRAME_WIDTH, MAX_FRAME_HEIGHT, SUPPORTED_EXTENSIONS, TEMPLATES_DIR,
+                       reference_currencies)
+from procpool import DETECT_BARCODES, DETECT_CURRENCY, DETECT_OBJECTS
+
+# Пакетный прогон детекторов по архиву фото и видео без Kivy: файлы декодируются
+# в пуле процессов, детекции пишутся построчно в NDJSON, прогресс — в отдельный файл
+DETECTORS = (DETECT_BARCODES, DETECT_CURRENCY, DETECT_OBJECTS)
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v')
+# Кадров видео в одной задаче: длинная запись делится между воркерами
+VIDEO_CHUNK = 300
+# Задач в работе на воркер: очередь и память не растут с размером архива
+IN_FLIGHT_PER_WORKER = 2
+PROGRESS_SUFFIX = '.progress'
+
+# Задача: (ключ прогресса, полный путь, путь относительно корня, начальный кадр, число кадров).
+# Для изображений начальный кадр None; число кадров None — до конца видео
+Task = Tuple[str, str, str, Optional[int], Optional[int]]
+
+
+def walk_files(root: str) -> Iterator[str]:
+    # Обход в отсортированном порядке без построения списка всех файлов
+    entries = sorted(os.scandir(root), key=lambda e: e.name)
+    for entry in entries:
+        if entry.name.startswith('.'):
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            yield from walk_files(entry.path)
+        elif entry.is_file():
+            yield entry.path
+
+
+def video_chunks(path: str, chunk: int) -> List[Tuple[int, Optional[int]]]:
+    import cv2
+    capture = cv2.VideoCapture(path)
+    try:
+        total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    finally:
+        capture.release()
+    if total <= chunk:
+        return [(0, None)]
+    # Число кадров из контейнера бывает неточным: последний кусок читается до конца
+    starts = list(range(0, total, chunk))
+    return [(start, chunk) for start in starts[:-1]] + [(starts[-1], None)]
+
+
+def iter_tasks(root: str, chunk: int) -> Iterator[Task]:
+    for path in walk_files(root):
+        relpath = os.path.relpath(path, root)
+        ext = os.path.splitext(path)[1].lower()
+        if ext in SUPPORTED_EXTENSIONS:
+            yield relpath, path, relpath, None, None
+        elif ext in VIDEO_EXTENSIONS:
+            for start, count in video_chunks(path, chunk):
+                yield f"{relpath}#{start}", path, relpath, start, count
+
+
+# Журнал выполненных задач. После каждой задачи в него пишется ключ и размер
+# файла результатов; при продолжении результаты обрезаются до последней
+# записанной отметки, поэтому недописанная задача не дублируется
+class ScanProgress:
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        self.offset = 0
+        self._valid_bytes = 0
+        self._file = None
+
+    def load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Оборванная последняя строка после аварийного завершения
+                        break
+                    self.done.add(record['task'])
+                    self.offset = record['offset']
+                    self._valid_bytes += len(line)
+        except OSError:
+            pass
+
+    def open(self):
+        self._file = open(self.path, 'a', encoding='utf-8')
+        # Оборванный хвост отрезается, иначе следующая запись склеится с ним
+        self._file.truncate(self._valid_bytes)
+
+    def mark(self, task: str, offset: int):
+        self.done.add(task)
+        self.offset = offset
+        self._file.write(json.dumps({'task': task, 'offset': offset}, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# Состояние процесса-воркера: свои детекторы без озвучки, голосования и памяти кодов,
+# чтобы каждый кадр размечался независимо
+_detectors: Dict[str, object] = {}
+_keep_empty = False
+
+
+def _init_worker(names: Tuple[str, ...], currency: str, templates: str, keep_empty: bool):
+    global _keep_empty
+    import cv2
+    from detectors import BarcodeReader, CurrencyRecognizer, ObjectDetector
+
+    # Параллелизм — на уровне процессов, внутренние потоки OpenCV только мешают
+    cv2.setNumThreads(1)
+    _keep_empty = keep_empty
+    for name in names:
+        if name == DETECT_BARCODES:
+            _detectors[name] = BarcodeReader()
+        elif name == DETECT_CURRENCY:
+            recognizer = CurrencyRecognizer()
+            recognizer.set_currency(currency)
+            _detectors[name] = recognizer
+        elif name == DETECT_OBJECTS:
+            # Хранилище скомпилированных шаблонов уже собрано родителем — здесь только mmap
+            detector = ObjectDetector()
+            detector.load_default_templates(templates)
+            _detectors[name] = detector
+
+
+def _detect(frame: np.ndarray) -> Dict[str, List[Dict]]:
+    from preprocess import FrameCache
+
+    cache = FrameCache(frame, max_width=MAX_FRAME_WIDTH, max_height=MAX_FRAME_HEIGHT)
+    results = {}
+    for name, detector in _detectors.items():
+        if name == DETECT_BARCODES:
+            results[name] = detector.decode_barcodes(frame, cache, remember=False)
+        elif name == DETECT_CURRENCY:
+            results[name] = detector.recognize_currency(frame, cache, vote=False)
+        elif name == DETECT_OBJECTS:
+            results[name] = detector.detect_objects(frame, cache, announce=False)
+    return results
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def _record(relpath: str, frame: np.ndarray, results: Dict[str, List[Dict]],
+            index: Optional[int] = None, timestamp: Optional[float] = None) -> Optional[str]:
+    if not _keep_empty and not any(results.values()):
+        return None
+    record = {'file': relpath, 'width': frame.shape[1], 'height': frame.shape[0]}
+    if index is not None:
+        record['frame'] = index
+        record['time'] = timestamp
+    record.update(results)
+    # Строка собирается в воркере: родитель только дописывает ее в файл
+    return json.dumps(record, ensure_ascii=False, default=_json_default)
+
+
+def _error_record(relpath: str, error: str) -> str:
+    # Битый файл отмечается в результатах и не повторяется при продолжении
+    return json.dumps({'file': relpath, 'error': error}, ensure_ascii=False)
+
+
+def scan_image(path: str, relpath: str) -> List[str]:
+    import cv2
+    frame = cv2.imread(path)
+    if frame is None:
+        return [_error_record(relpath, "cannot decode image")]
+    line = _record(relpath, frame, _detect(frame))
+    return [line] if line else []
+
+
+def scan_video(path: str, relpath: str, start: int, count: Optional[int], stride: int) -> List[str]:
+    import cv2
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        return [_error_record(relpath, "cannot open video")]
+    lines = []
+    try:
+        if start:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+        index = start
+        while count is None or index < start + count:
+            # Пропускаемые кадры только захватываются, без преобразования в BGR
+            if not capture.grab():
+                break
+            if index % stride == 0:
+                ok, frame = capture.retrieve()
+                if ok:
+                    timestamp = round(index / fps, 3) if fps > 0 else None
+                    line = _record(relpath, frame, _detect(frame), index, timestamp)
+                    if line:
+                        lines.append(line)
+            index += 1
+    finally:
+        capture.release()
+    return lines
+
+
+def prepare_templates(templates: str) -> int:
+    # Один раз компилируем шаблоны в хранилище, чтобы воркеры не делали это параллельно
+    from detectors import ObjectDetector
+    detector = ObjectDetector()
+    detector.load_default_templates(templates)
+    return len(detector.templates)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Batch detector scan over image and video archives")
+    parser.add_argument('root', help="каталог с фотографиями и видео (обходится рекурсивно)")
+    parser.add_argument('-o', '--output', required=True, help="файл NDJSON с детекциями")
+    parser.add_argument('-d', '--detector', dest='detectors', choices=DETECTORS, action='append',
+                        help="детектор (по умолчанию все)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="число процессов-воркеров")
+    parser.add_argument('--stride', type=int, default=1, help="обрабатывать каждый N-й кадр видео")
+    parser.add_argument('--chunk', type=int, default=VIDEO_CHUNK, help="кадров видео в одной задаче")
+    parser.add_argument('--keep-empty', action='store_true',
+                        help="писать записи и для кадров без детекций")
+    parser.add_argument('--currency', default='rub')
+    parser.add_argument('--templates', default=TEMPLATES_DIR)
+    parser.add_argument('--progress', help="файл прогресса (по умолчанию <output>.progress)")
+    parser.add_argument('--restart', action='store_true', help="начать заново, не продолжая прогон")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if not os.path.isdir(args.root):
+        print(f"Not a directory: {args.root}", file=sys.stderr)
+        return 1
+    names = tuple(args.detectors or DETECTORS)
+    if DETECT_CURRENCY in names and args.currency not in reference_currencies():
+        # Иначе в выходе были бы пустые записи купюр, неотличимые от "купюр нет"
+        print(f"No currency references for {args.currency}: skipping currency detector",
+              file=sys.stderr)
+        names = tuple(name for name in names if name != DETECT_CURRENCY)
+        if not names:
+            return 1
+    jobs = max(1, args.jobs)
+    stride = max(1, args.stride)
+    chunk = max(stride, args.chunk)
+
+    progress = ScanProgress(args.progress or args.output + PROGRESS_SUFFIX)
+    if not args.restart:
+        progress.load()
+    if progress.done:
+        print(f"Resuming: {len(progress.done)} tasks done", file=sys.stderr)
+    # Результаты недописанных задач отбрасываются — они будут пересчитаны
+    with open(args.output, 'ab') as output:
+        output.truncate(progress.offset)
+
+    if DETECT_OBJECTS in names:
+        loaded = prepare_templates(args.templates)
+        if not loaded:
+            print(f"No object templates in {args.templates}", file=sys.stderr)
+
+    tasks = iter_tasks(args.root, chunk)
+    max_in_flight = jobs * IN_FLIGHT_PER_WORKER
+    pending = {}
+    completed = failed = records = 0
+    start_time = time.monotonic()
+    progress.open()
+    executor = ProcessPoolExecutor(jobs, initializer=_init_worker,
+                                   initargs=(names, args.currency, args.templates, args.keep_empty))
+    try:
+        with open(args.output, 'ab') as output:
+            exhausted = False
+            while True:
+                # Новые задачи берутся из обхода только при наличии места в очереди
+                while not exhausted and len(pending) < max_in_flight:
+                    task = next(tasks, None)
+                    if task is None:
+                        exhausted = True
+                        break
+                    key, path, relpath, first, count = task
+                    if key in progress.done:
+                        continue
+                    if first is None:
+                        future = executor.submit(scan_image, path, relpath)
+                    else:
+                        future = executor.submit(scan_video, path, relpath, first, count, stride)
+                    pending[future] = key
+                if not pending:
+                    break
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = pending.pop(future)
+                    try:
+                        lines = future.result()
+                    except Exception as e:
+                        # Задача не отмечается выполненной и повторится при продолжении
+                        failed += 1
+                        print(f"Scan Error: {key}: {e}", file=sys.stderr)
+                        continue
+                    for line in lines:
+                        output.write(line.encode('utf-8') + b'\n')
+                    output.flush()
+                    progress.mark(key, output.tell())
+                    completed += 1
+                    records += len(lines)
+                    if completed % 100 == 0:
+                        elapsed = time.monotonic() - start_time
+                        print(f"{completed} tasks, {records} records, "
+                              f"{completed / elapsed:.1f} tasks/s", file=sys.stderr)
+    except KeyboardInterrupt:
+        for future in pending:
+            future.cancel()
+        print("Interrupted: progress saved, run again to resume", file=sys.stderr)
+        return 130
+    finally:
+        executor.shutdown(wait=True)
+        progress.close()
+
+    print(f"Done: {completed} tasks, {records} records, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
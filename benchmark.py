@@ -0,0 +1,196 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from capture import CameraCapture, open_source
+from detectors import (BarcodeReader, CurrencyRecognizer, ObjectDetector, MAX_FRAME_WIDTH,
+                       MAX_FRAME_HEIGHT, TEMPLATES_DIR)
+from preprocess import FrameCache
+from profiling import StageStats
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Прогон без окна Kivy: записанные кадры проходят через каждый детектор,
+# результат — JSON с пропускной способностью, перцентилями задержки и памятью
+DETECTORS = ('barcodes', 'currency', 'objects')
+
+
+def parse_resolution(value: str) -> Tuple[int, int]:
+    try:
+        width, height = value.lower().split('x')
+        return int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Resolution must look like 640x480: {value}")
+
+
+def load_frames(path: str, max_frames: int) -> List[np.ndarray]:
+    # Те же источники, что и у приложения: видео, каталог изображений или сырой дамп
+    source = open_source(path)
+    if isinstance(source, CameraCapture):
+        raise SystemExit("Benchmark needs recorded frames, not a live camera")
+    # Кадры дампа копируются в память, чтобы чтение с диска не попадало в замеры
+    return [np.array(frame) for _, frame in itertools.islice(source.frames(), max_frames)]
+
+
+def make_detector(name: str, args) -> Tuple[Optional[Callable[[np.ndarray, FrameCache], List[Dict]]], Dict]:
+    # Свежий экземпляр на каждый прогон, озвучка отключена. Память кодов и
+    # голосование выключены: на повторяющихся кадрах замерялись бы их короткие пути,
+    # а не zbar и классификатор
+    if name == 'barcodes':
+        reader = BarcodeReader()
+        return partial(reader.decode_barcodes, remember=False), {}
+    if name == 'currency':
+        recognizer = CurrencyRecognizer()
+        recognizer.set_currency(args.currency)
+        if not recognizer.available():
+            # Без эталонов классификатор сразу возвращает пустой список — замерять нечего
+            return None, {'currency': recognizer.currency_type, 'available': False}
+        return partial(recognizer.recognize_currency, vote=False), {'currency': recognizer.currency_type}
+    detector = ObjectDetector()
+    detector.load_default_templates(args.templates)
+    return detector.detect_objects, {'templates': len(detector.templates)}
+
+
+def resize_frames(frames: List[np.ndarray], resolution: Tuple[int, int]) -> List[np.ndarray]:
+    return [frame if frame.shape[1::-1] == resolution
+            else cv2.resize(frame, resolution, interpolation=cv2.INTER_AREA)
+            for frame in frames]
+
+
+def run_detector(name: str, frames: List[np.ndarray], args) -> Dict:
+    detect, info = make_detector(name, args)
+    if detect is None:
+        return info
+    for frame in frames[:args.warmup]:
+        detect(frame, FrameCache(frame, max_width=MAX_FRAME_WIDTH, max_height=MAX_FRAME_HEIGHT))
+
+    stats = StageStats(size=len(frames) * args.repeat)
+    detections = 0
+    busy = 0.0
+    for _ in range(args.repeat):
+        for frame in frames:
+            # Кэш кадра создается на каждый кадр, как в приложении
+            start = time.perf_counter()
+            cache = FrameCache(frame, max_width=MAX_FRAME_WIDTH, max_height=MAX_FRAME_HEIGHT)
+            result = detect(frame, cache)
+            elapsed = time.perf_counter() - start
+            stats.record(elapsed)
+            busy += elapsed
+            detections += len(result)
+
+    summary = stats.summary()
+    summary.pop('fps', None)
+    summary.update(info)
+    summary['fps'] = stats.count / busy if busy > 0 else 0.0
+    summary['detections_per_frame'] = detections / max(stats.count, 1)
+
+    if args.memory:
+        # Отдельный проход: tracemalloc искажает время, поэтому память меряется не в основном
+        detect, _ = make_detector(name, args)
+        tracemalloc.start()
+        for frame in frames:
+            detect(frame, FrameCache(frame, max_width=MAX_FRAME_WIDTH, max_height=MAX_FRAME_HEIGHT))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        summary['peak_traced_mb'] = peak / 2 ** 20
+    return summary
+
+
+def maxrss_mb() -> Optional[float]:
+    # Пик памяти процесса с момента запуска: только растет, поэтому один на весь отчет
+    if resource is None:
+        return None
+    # ru_maxrss — в килобайтах на Linux и в байтах на macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Headless detector benchmark")
+    parser.add_argument('source', help="видеофайл, папка с изображениями или сырой дамп кадров")
+    parser.add_argument('-r', '--resolution', dest='resolutions', type=parse_resolution,
+                        action='append', help="разрешение кадров, например 640x480 (можно несколько)")
+    parser.add_argument('-d', '--detector', dest='detectors', choices=DETECTORS, action='append',
+                        help="детектор (по умолчанию все)")
+    parser.add_argument('-n', '--max-frames', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--currency', default='rub')
+    parser.add_argument('--templates', default=TEMPLATES_DIR)
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help="не делать проход с tracemalloc")
+    parser.add_argument('-o', '--output', help="файл JSON (по умолчанию stdout)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    frames = load_frames(args.source, args.max_frames)
+    if not frames:
+        print(f"No frames in {args.source}", file=sys.stderr)
+        return 1
+
+    resolutions = args.resolutions or [(MAX_FRAME_WIDTH, MAX_FRAME_HEIGHT)]
+    results = []
+    for resolution in resolutions:
+        scaled = resize_frames(frames, resolution)
+        for name in args.detectors or DETECTORS:
+            summary = run_detector(name, scaled, args)
+            summary.update(detector=name, resolution=f"{resolution[0]}x{resolution[1]}")
+            results.append(summary)
+            if summary.get('available') is False:
+                print(f"{name} {summary['resolution']}: skipped, detector unavailable", file=sys.stderr)
+                continue
+            print(f"{name} {summary['resolution']}: {summary['fps']:.1f} fps, "
+                  f"p95 {summary.get('p95_ms', 0):.1f} ms", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'timestamp': time.time(),
+            'revision': git_revision(),
+            'source': os.path.abspath(args.source),
+            'frames': len(frames),
+            'repeat': args.repeat,
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'maxrss_mb': maxrss_mb(),
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,7 +4,7 @@ title = Vision Assist
 package.name = visionassist
 package.domain = org.example
 source.dir = .
-source.include_exts = py,png,jpg,kv,atlas,txt,ttf
+source.include_exts = py,png,jpg,kv,atlas,txt,ttf,json
 source.exclude_exts = spec
 source.inclusions = ./templates
 version = 0.1
@@ -0,0 +1,374 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+from profiling import PROFILER
+
+
+@dataclass(frozen=True)
+class FramePacket:
+    frame_id: int
+    timestamp: float
+    frame: np.ndarray
+
+
+# Слот последнего кадра: один писатель, читатели забирают ссылку без копирования.
+# Старые кадры просто перезаписываются, поэтому задержка не больше одного кадра.
+class LatestFrameSlot:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._packet: Optional[FramePacket] = None
+        self._next_id = 1
+
+    def publish(self, frame: np.ndarray, timestamp: Optional[float] = None) -> FramePacket:
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._lock:
+            packet = FramePacket(self._next_id, timestamp, frame)
+            self._next_id += 1
+            self._packet = packet
+        return packet
+
+    def latest(self) -> Optional[FramePacket]:
+        # Чтение одной ссылки атомарно, блокировка читателю не нужна
+        return self._packet
+
+
+# Источник кадров: поток-производитель публикует кадры в LatestFrameSlot,
+# приложение смотрит последний через latest() (превью) и забирает на обработку
+# через take() (детектор). Любой источник можно записать
+class FrameSource:
+    def __init__(self):
+        self.slot = LatestFrameSlot()
+        self.recorder: Optional['FrameRecorder'] = None
+
+    def start(self) -> bool:
+        raise NotImplementedError
+
+    def latest(self) -> Optional[FramePacket]:
+        return self.slot.latest()
+
+    def take(self) -> Optional[FramePacket]:
+        # Живой источник не ждет потребителя: забрать кадр — то же, что посмотреть
+        return self.slot.latest()
+
+    @property
+    def is_running(self) -> bool:
+        return False
+
+    def stop(self, timeout: float = 1.0):
+        pass
+
+    def _publish(self, frame: np.ndarray, timestamp: Optional[float] = None) -> FramePacket:
+        packet = self.slot.publish(frame, timestamp)
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.write(packet.frame, packet.timestamp)
+        return packet
+
+
+# Захват камеры в отдельном потоке: главный поток Kivy никогда не ждет сенсор
+class CameraCapture(FrameSource):
+    def __init__(self, camera_id: int = 0, width: Optional[int] = None,
+                 height: Optional[int] = None, fps: Optional[float] = None):
+        super().__init__()
+        self.camera_id = camera_id
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self._capture = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.read_failures = 0
+
+    def open(self) -> bool:
+        # OpenCV импортируется при открытии источника, а не при старте приложения
+        import cv2
+        try:
+            capture = cv2.VideoCapture(self.camera_id)
+            if self.width:
+                capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            if self.height:
+                capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+            if self.fps:
+                capture.set(cv2.CAP_PROP_FPS, self.fps)
+            # Не держим очередь кадров в драйвере — нужен только свежий
+            capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            if not capture.isOpened():
+                capture.release()
+                return False
+        except Exception:
+            return False
+        self._capture = capture
+        return True
+
+    def start(self) -> bool:
+        if self._thread is not None:
+            return True
+        if self._capture is None and not self.open():
+            return False
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='camera-capture', daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        # После старта VideoCapture принадлежит только этому потоку
+        capture = self._capture
+        try:
+            while self._running:
+                with PROFILER.span('capture'):
+                    ret, frame = capture.read()
+                if not ret:
+                    self.read_failures += 1
+                    time.sleep(0.01)
+                    continue
+                self._publish(frame)
+        finally:
+            capture.release()
+            self._capture = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._running and self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout: float = 1.0):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        elif self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+
+# Воспроизведение записанных кадров: с исходной скоростью по временным меткам
+# или с максимальной (speed=0), когда следующий кадр выдается, как только
+# приложение забрало предыдущий через take() — так прогон детерминирован.
+# latest() кадр не забирает: превью с любой частотой не двигает воспроизведение
+class ReplaySource(FrameSource):
+    def __init__(self, speed: float = 1.0, loop: bool = False):
+        super().__init__()
+        self.speed = speed
+        self.loop = loop
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._taken = threading.Event()
+        self._taken_id = 0
+        self.finished = False
+
+    def frames(self) -> Iterator[Tuple[float, np.ndarray]]:
+        # (временная метка в секундах, кадр) по порядку записи
+        raise NotImplementedError
+
+    def start(self) -> bool:
+        if self._thread is not None:
+            return True
+        self._running = True
+        self.finished = False
+        self._thread = threading.Thread(target=self._run, name='frame-replay', daemon=True)
+        self._thread.start()
+        return True
+
+    def take(self) -> Optional[FramePacket]:
+        packet = self.slot.latest()
+        if packet is not None:
+            self._taken_id = packet.frame_id
+            self._taken.set()
+        return packet
+
+    def _run(self):
+        while self._running:
+            started = time.monotonic()
+            first = None
+            packet = None
+            for timestamp, frame in self.frames():
+                if not self._running:
+                    return
+                if self.speed > 0:
+                    if first is None:
+                        first = timestamp
+                    delay = started + (timestamp - first) / self.speed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                elif packet is not None:
+                    # Максимальная скорость: ждем, пока приложение заберет кадр
+                    while self._running and self._taken_id < packet.frame_id:
+                        self._taken.wait(0.1)
+                        self._taken.clear()
+                packet = self._publish(frame, timestamp)
+            if not self.loop or packet is None:
+                break
+        self.finished = True
+
+    @property
+    def is_running(self) -> bool:
+        return self._running and self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout: float = 1.0):
+        self._running = False
+        self._taken.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+class VideoFileSource(ReplaySource):
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = False):
+        super().__init__(speed, loop)
+        self.path = path
+
+    def start(self) -> bool:
+        if not os.path.isfile(self.path):
+            return False
+        return super().start()
+
+    def frames(self) -> Iterator[Tuple[float, np.ndarray]]:
+        import cv2
+        capture = cv2.VideoCapture(self.path)
+        try:
+            fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+            index = 0
+            while True:
+                ret, frame = capture.read()
+                if not ret:
+                    return
+                yield index / fps, frame
+                index += 1
+        finally:
+            capture.release()
+
+
+class ImageSequenceSource(ReplaySource):
+    EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+    def __init__(self, directory: str, fps: float = 15.0, speed: float = 1.0, loop: bool = False):
+        super().__init__(speed, loop)
+        self.directory = directory
+        self.fps = fps
+
+    def _paths(self):
+        return [os.path.join(self.directory, name) for name in sorted(os.listdir(self.directory))
+                if name.lower().endswith(self.EXTENSIONS)]
+
+    def start(self) -> bool:
+        if not os.path.isdir(self.directory) or not self._paths():
+            return False
+        return super().start()
+
+    def frames(self) -> Iterator[Tuple[float, np.ndarray]]:
+        import cv2
+        for index, path in enumerate(self._paths()):
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield index / self.fps, frame
+
+
+# Формат сырой записи: каталог с frames.raw (кадры подряд, uint8),
+# timestamps.f64 (метки float64) и meta.json (размер кадра)
+DUMP_FRAMES = 'frames.raw'
+DUMP_TIMESTAMPS = 'timestamps.f64'
+DUMP_META = 'meta.json'
+
+
+def is_frame_dump(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, DUMP_META))
+
+
+class RawDumpSource(ReplaySource):
+    def __init__(self, directory: str, speed: float = 1.0, loop: bool = False):
+        super().__init__(speed, loop)
+        self.directory = directory
+
+    def start(self) -> bool:
+        if not is_frame_dump(self.directory):
+            return False
+        return super().start()
+
+    def open(self) -> Tuple[np.ndarray, np.ndarray]:
+        with open(os.path.join(self.directory, DUMP_META), encoding='utf-8') as f:
+            meta = json.load(f)
+        shape = (meta['height'], meta['width'], meta['channels'])
+        frame_bytes = shape[0] * shape[1] * shape[2]
+        path = os.path.join(self.directory, DUMP_FRAMES)
+        # Число кадров по размеру файла: запись, оборванная на середине, тоже читается
+        count = os.path.getsize(path) // frame_bytes
+        timestamps = np.fromfile(os.path.join(self.directory, DUMP_TIMESTAMPS), dtype=np.float64)
+        count = min(count, len(timestamps))
+        if count == 0:
+            return np.empty((0,) + shape, np.uint8), timestamps[:0]
+        frames = np.memmap(path, dtype=np.uint8, mode='r', shape=(count,) + shape)
+        return frames, timestamps[:count]
+
+    def frames(self) -> Iterator[Tuple[float, np.ndarray]]:
+        frames, timestamps = self.open()
+        for index in range(len(frames)):
+            # Кадр отображен из файла без копирования
+            yield float(timestamps[index]), frames[index]
+
+
+# Запись кадров в сырой формат для последующего детерминированного воспроизведения
+class FrameRecorder:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.count = 0
+        self._shape: Optional[Tuple[int, ...]] = None
+        self._frames = None
+        self._timestamps = None
+        self._lock = threading.Lock()
+
+    def write(self, frame: np.ndarray, timestamp: float):
+        with self._lock:
+            if self._frames is None:
+                self._open(frame)
+            elif frame.shape != self._shape:
+                # В дамп пишутся только кадры одного размера
+                return
+            self._frames.write(np.ascontiguousarray(frame, dtype=np.uint8).tobytes())
+            self._timestamps.write(np.float64(timestamp).tobytes())
+            self.count += 1
+
+    def _open(self, frame: np.ndarray):
+        os.makedirs(self.directory, exist_ok=True)
+        self._shape = frame.shape
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        with open(os.path.join(self.directory, DUMP_META), 'w', encoding='utf-8') as f:
+            json.dump({'width': width, 'height': height, 'channels': channels,
+                       'dtype': 'uint8', 'created': time.time()}, f, indent=2)
+        self._frames = open(os.path.join(self.directory, DUMP_FRAMES), 'wb')
+        self._timestamps = open(os.path.join(self.directory, DUMP_TIMESTAMPS), 'wb')
+
+    def close(self):
+        with self._lock:
+            for f in (self._frames, self._timestamps):
+                if f is not None:
+                    f.close()
+            self._frames = self._timestamps = None
+
+
+# Один и тот же кадр без повторных выделений памяти: замена прежнего test_mode
+class BlankSource(FrameSource):
+    def __init__(self, width: int, height: int):
+        super().__init__()
+        self.frame = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def start(self) -> bool:
+        self._publish(self.frame)
+        return True
+
+
+def open_source(spec: str, speed: float = 1.0, loop: bool = False) -> FrameSource:
+    # 'camera:1' — камера, каталог с meta.json — сырой дамп, каталог — изображения, файл — видео
+    if spec.startswith('camera:'):
+        return CameraCapture(int(spec.split(':', 1)[1] or 0))
+    if os.path.isdir(spec):
+        if is_frame_dump(spec):
+            return RawDumpSource(spec, speed, loop)
+        return ImageSequenceSource(spec, speed=speed, loop=loop)
+    return VideoFileSource(spec, speed, loop)
@@ -0,0 +1,32 @@
+import json
+import os
+
+# Общие настройки без тяжелых зависимостей: их можно импортировать при старте
+# приложения, не загружая OpenCV и детекторы
+IS_ANDROID = 'ANDROID_ARGUMENT' in os.environ or 'P4A_BOOTSTRAP' in os.environ
+
+# Ограничиваем разрешение для производительности
+if IS_ANDROID:
+    MAX_FRAME_WIDTH = 480
+    MAX_FRAME_HEIGHT = 360
+else:
+    MAX_FRAME_WIDTH = 640
+    MAX_FRAME_HEIGHT = 480
+
+TEMPLATES_DIR = "templates"
+SUPPORTED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Эталоны купюр собираются из фотографий: python currency.py <папка с фото>
+CURRENCY_REFERENCES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                        'data', 'currency_refs.json')
+
+
+def reference_currencies(path: str = CURRENCY_REFERENCES_PATH) -> set:
+    # Валюты, для которых есть эталоны. Читается только json, без OpenCV:
+    # по нему решается, показывать ли вкладку купюр и запускать ли классификатор
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    return {ref.get('currency') for ref in data.get('references', [])}
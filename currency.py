@@ -0,0 +1,345 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from constants import CURRENCY_REFERENCES_PATH
+
+# Признак купюры — компактная гистограмма HSV: HUE_BINS оттенков для насыщенных
+# пикселей плюс две корзины для ненасыщенных (светлые и темные)
+HUE_BINS = 12
+FEATURE_BINS = HUE_BINS + 2
+MIN_SATURATION = 60
+LIGHT_VALUE = 128
+# Признаки считаются на сильно уменьшенном кадре
+FEATURE_WIDTH = 128
+# Кандидаты купюр ищутся на кадре фиксированной ширины: стоимость не зависит
+# от разрешения камеры, а пороги заданы долями кадра
+CANDIDATE_WIDTH = 320
+MIN_AREA_FRACTION = 0.03
+MAX_AREA_FRACTION = 0.9
+MIN_ASPECT = 1.5
+MAX_ASPECT = 3.0
+# Окно адаптивного порога в долях ширины кадра
+THRESHOLD_BLOCK_FRACTION = 0.1
+THRESHOLD_OFFSET = 7
+POLY_EPSILON = 0.03
+# Резкость softmax по сходству Бхаттачарии при оценке уверенности
+CONFIDENCE_SHARPNESS = 20.0
+
+# Голосование по кадрам: номинал сообщается, когда его суммарная уверенность
+# в окне опережает второй номинал на CURRENCY_VOTE_MARGIN
+CURRENCY_VOTE_WINDOW = 8
+CURRENCY_VOTE_MARGIN = 1.5
+CURRENCY_MIN_VOTES = 3
+CURRENCY_TRACK_TTL = 1.5
+# Сопоставление региона с треком и признаки "регион не изменился"
+TRACK_MATCH_IOU = 0.4
+STILL_IOU = 0.9
+STILL_DIFF = 6.0
+THUMB_SIZE = (16, 8)
+# Неизменный регион все равно переклассифицируется не реже этого интервала
+CURRENCY_REVERIFY_INTERVAL = 1.0
+
+REFERENCES_PATH = CURRENCY_REFERENCES_PATH
+
+
+def color_bins(bgr: np.ndarray) -> np.ndarray:
+    hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+    hue, sat, val = cv2.split(hsv)
+    bins = (hue.astype(np.uint16) * HUE_BINS // 180).astype(np.uint8)
+    achromatic = sat < MIN_SATURATION
+    bins[achromatic] = np.where(val[achromatic] >= LIGHT_VALUE, HUE_BINS, HUE_BINS + 1)
+    return bins
+
+
+def integral_histogram(bins: np.ndarray) -> np.ndarray:
+    # Интегральная гистограмма: гистограмма любого прямоугольника — 4 выборки
+    h, w = bins.shape[:2]
+    onehot = (bins[..., None] == np.arange(FEATURE_BINS, dtype=np.uint8)).astype(np.int32)
+    integral = np.zeros((h + 1, w + 1, FEATURE_BINS), np.int32)
+    integral[1:, 1:] = onehot.cumsum(0).cumsum(1)
+    return integral
+
+
+def region_histograms(integral: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    # Гистограммы всех регионов сразу, без цикла по регионам
+    h, w = integral.shape[0] - 1, integral.shape[1] - 1
+    x0 = np.clip(boxes[:, 0], 0, w)
+    y0 = np.clip(boxes[:, 1], 0, h)
+    x1 = np.clip(boxes[:, 0] + boxes[:, 2], 0, w)
+    y1 = np.clip(boxes[:, 1] + boxes[:, 3], 0, h)
+    hist = (integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]).astype(np.float32)
+    return hist / np.maximum(hist.sum(axis=1, keepdims=True), 1)
+
+
+def candidate_scale(width: int) -> float:
+    return min(CANDIDATE_WIDTH / width, 1.0)
+
+
+def find_banknote_candidates(gray: np.ndarray) -> List[Tuple[Tuple[int, int, int, int], np.ndarray]]:
+    # gray — кадр шириной около CANDIDATE_WIDTH; координаты возвращаются в нем же
+    h, w = gray.shape[:2]
+    block = max(3, int(w * THRESHOLD_BLOCK_FRACTION) | 1)
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    # Адаптивный порог выделяет границы купюры при любой освещенности
+    edges = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
+                                  cv2.THRESH_BINARY_INV, block, THRESHOLD_OFFSET)
+    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8))
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    frame_area = float(h * w)
+    candidates = []
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if not MIN_AREA_FRACTION * frame_area <= area <= MAX_AREA_FRACTION * frame_area:
+            continue
+        # Купюра в кадре — выпуклый четырехугольник
+        quad = cv2.approxPolyDP(contour, POLY_EPSILON * cv2.arcLength(contour, True), True)
+        if len(quad) != 4 or not cv2.isContourConvex(quad):
+            continue
+        (_, _), (rw, rh), _ = cv2.minAreaRect(quad)
+        if min(rw, rh) < 1 or not MIN_ASPECT < max(rw, rh) / min(rw, rh) < MAX_ASPECT:
+            continue
+        candidates.append((cv2.boundingRect(quad), quad.reshape(-1, 2)))
+    return candidates
+
+
+def feature_bins(bgr: np.ndarray) -> np.ndarray:
+    h, w = bgr.shape[:2]
+    if w > FEATURE_WIDTH:
+        bgr = cv2.resize(bgr, (FEATURE_WIDTH, max(1, int(h * FEATURE_WIDTH / w))),
+                         interpolation=cv2.INTER_AREA)
+    return color_bins(bgr)
+
+
+def image_histogram(bgr: np.ndarray) -> np.ndarray:
+    hist = np.bincount(feature_bins(bgr).ravel(), minlength=FEATURE_BINS).astype(np.float32)
+    return hist / max(hist.sum(), 1)
+
+
+# Таблица эталонов: номиналы, их названия и гистограммы. Новая валюта — это
+# новые данные в JSON, а не новый код
+class CurrencyReferences:
+    def __init__(self, names: Dict[str, Dict[int, str]],
+                 entries: Sequence[Tuple[str, int, np.ndarray]]):
+        self.names = names
+        self._tables: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for currency in names:
+            rows = [(nominal, hist) for cur, nominal, hist in entries if cur == currency]
+            if not rows:
+                continue
+            nominals = np.array([nominal for nominal, _ in rows])
+            # sqrt-нормировка: скалярное произведение равно коэффициенту Бхаттачарии
+            features = np.sqrt(np.array([hist / max(hist.sum(), 1e-6) for _, hist in rows],
+                                        dtype=np.float32))
+            self._tables[currency] = (nominals, features)
+
+    @classmethod
+    def load(cls, path: str = REFERENCES_PATH) -> 'CurrencyReferences':
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Currency references Error: {e}")
+            return cls({}, [])
+        if data.get('hue_bins', HUE_BINS) != HUE_BINS:
+            print("Currency references Error: feature layout mismatch")
+            return cls({}, [])
+        names = {currency: {int(nominal): name for nominal, name in nominals.items()}
+                 for currency, nominals in data.get('currencies', {}).items()}
+        entries = [(ref['currency'], int(ref['nominal']), np.array(ref['histogram'], np.float32))
+                   for ref in data.get('references', [])]
+        return cls(names, entries)
+
+    def table(self, currency: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        return self._tables.get(currency)
+
+    def available(self, currency: str) -> bool:
+        # Валюта без эталонов не распознается: угадывание номинала хуже молчания
+        return currency in self._tables
+
+
+# Классификатор ближайшего соседа по цветовым признакам
+class CurrencyClassifier:
+    def __init__(self, references: CurrencyReferences):
+        self.references = references
+
+    def classify(self, bgr: np.ndarray, boxes: Sequence[Tuple[int, int, int, int]],
+                 currency: str, bins: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        table = self.references.table(currency)
+        if table is None or not len(boxes):
+            return []
+        nominals, refs = table
+
+        if bins is None:
+            bins = feature_bins(bgr)
+        scale = bins.shape[1] / bgr.shape[1]
+        scaled = np.round(np.asarray(boxes, np.float32) * scale).astype(np.int32)
+        features = np.sqrt(region_histograms(integral_histogram(bins), scaled))
+
+        # Сходство со всеми эталонами одним умножением матриц
+        similarity = features @ refs.T
+        best = similarity.argmax(axis=1)
+        weights = np.exp(CONFIDENCE_SHARPNESS * (similarity - similarity.max(axis=1, keepdims=True)))
+        confidence = weights[np.arange(len(best)), best] / weights.sum(axis=1)
+        return [(int(nominals[i]), float(c)) for i, c in zip(best, confidence)]
+
+
+def box_iou(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = w * h
+    return inter / float(aw * ah + bw * bh - inter + 1e-6)
+
+
+def region_thumbnail(gray: np.ndarray, box: Tuple[int, int, int, int]) -> np.ndarray:
+    x, y, w, h = box
+    roi = gray[max(0, y):y + h, max(0, x):x + w]
+    if roi.size == 0:
+        return np.zeros(THUMB_SIZE[::-1], np.int16)
+    return cv2.resize(roi, THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+class CurrencyTrack:
+    __slots__ = ('bbox', 'thumb', 'votes', 'last_seen', 'last_classified',
+                 'last_result', 'winner', 'announced')
+
+    def __init__(self, bbox: Tuple[int, int, int, int], thumb: Optional[np.ndarray], window: int):
+        self.bbox = bbox
+        self.thumb = thumb
+        self.votes = deque(maxlen=window)
+        self.last_seen = 0.0
+        self.last_classified = 0.0
+        self.last_result: Optional[Tuple[int, float]] = None
+        self.winner: Optional[Tuple[int, float]] = None
+        self.announced: Optional[int] = None
+
+    def unchanged(self, bbox: Tuple[int, int, int, int], thumb: np.ndarray, now: float) -> bool:
+        return (self.last_result is not None and self.thumb is not None
+                and now - self.last_classified < CURRENCY_REVERIFY_INTERVAL
+                and box_iou(self.bbox, bbox) >= STILL_IOU
+                and float(np.abs(self.thumb - thumb).mean()) < STILL_DIFF)
+
+
+# Трекер регионов с купюрами: копит уверенность по номиналам в скользящем
+# окне кадров и выдает событие, только когда победитель устойчив
+class CurrencyVoteTracker:
+    def __init__(self, window: int = CURRENCY_VOTE_WINDOW, margin: float = CURRENCY_VOTE_MARGIN,
+                 min_votes: int = CURRENCY_MIN_VOTES, ttl: float = CURRENCY_TRACK_TTL):
+        self.window = window
+        self.margin = margin
+        self.min_votes = min_votes
+        self.ttl = ttl
+        self._tracks: List[CurrencyTrack] = []
+        self._events: List[Tuple[str, CurrencyTrack]] = []
+        self._lock = threading.Lock()
+
+    def match(self, boxes: Sequence[Tuple[int, int, int, int]], thumbs: Sequence[Optional[np.ndarray]],
+              now: Optional[float] = None) -> List[CurrencyTrack]:
+        # Каждому региону — трек с наибольшим перекрытием или новый трек
+        now = time.time() if now is None else now
+        with self._lock:
+            self._tracks = [t for t in self._tracks if now - t.last_seen <= self.ttl]
+            free = list(self._tracks)
+            matched = []
+            for bbox, thumb in zip(boxes, thumbs):
+                best = max(free, key=lambda t: box_iou(t.bbox, bbox), default=None)
+                if best is None or box_iou(best.bbox, bbox) < TRACK_MATCH_IOU:
+                    best = CurrencyTrack(bbox, thumb, self.window)
+                    self._tracks.append(best)
+                else:
+                    free.remove(best)
+                matched.append(best)
+        return matched
+
+    def observe(self, track: CurrencyTrack, bbox: Tuple[int, int, int, int], thumb: Optional[np.ndarray],
+                result: Tuple[int, float], classified: bool, now: Optional[float] = None
+                ) -> Optional[Tuple[int, float]]:
+        now = time.time() if now is None else now
+        with self._lock:
+            track.last_seen = now
+            if classified:
+                # Эталон для проверки неизменности обновляем только вместе с классификацией
+                track.bbox = bbox
+                track.thumb = thumb
+                track.last_classified = now
+            track.last_result = result
+            track.votes.append(result)
+            track.winner = self._winner(track)
+            if track.winner is not None and track.winner[0] != track.announced:
+                track.announced = track.winner[0]
+                self._events.append(('confirmed', track))
+            return track.winner
+
+    def _winner(self, track: CurrencyTrack) -> Optional[Tuple[int, float]]:
+        if len(track.votes) < self.min_votes:
+            return None
+        scores: Dict[int, float] = {}
+        for nominal, confidence in track.votes:
+            scores[nominal] = scores.get(nominal, 0.0) + confidence
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if ranked[0][1] - runner_up < self.margin:
+            return None
+        return ranked[0][0], ranked[0][1] / len(track.votes)
+
+    def pop_events(self) -> List[Tuple[str, CurrencyTrack]]:
+        with self._lock:
+            events, self._events = self._events, []
+        return events
+
+    def clear(self):
+        with self._lock:
+            self._tracks = []
+            self._events = []
+
+
+def build_references(samples_dir: str, path: str = REFERENCES_PATH):
+    # Пересчет эталонов по фотографиям: samples_dir/<валюта>/<номинал>/*.jpg
+    current = {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            current = json.load(f)
+    except (OSError, ValueError):
+        pass
+    names = current.get('currencies', {})
+    references = []
+    for currency in sorted(os.listdir(samples_dir)):
+        currency_dir = os.path.join(samples_dir, currency)
+        if not os.path.isdir(currency_dir):
+            continue
+        for nominal in sorted(os.listdir(currency_dir), key=lambda n: int(n) if n.isdigit() else 0):
+            nominal_dir = os.path.join(currency_dir, nominal)
+            if not nominal.isdigit() or not os.path.isdir(nominal_dir):
+                continue
+            hists = []
+            for name in sorted(os.listdir(nominal_dir)):
+                image = cv2.imread(os.path.join(nominal_dir, name))
+                if image is not None:
+                    hists.append(image_histogram(image))
+            if hists:
+                references.append({'currency': currency, 'nominal': int(nominal),
+                                   'histogram': [round(float(x), 4) for x in np.mean(hists, axis=0)]})
+                names.setdefault(currency, {}).setdefault(nominal, nominal)
+    data = {'hue_bins': HUE_BINS, 'currencies': names, 'references': references}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+        f.write('\n')
+    return len(references)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Использование: python currency.py <папка с образцами> [файл эталонов]")
+        sys.exit(1)
+    count = build_references(*sys.argv[1:3])
+    print(f"Эталонов: {count}")
@@ -0,0 +1,559 @@
+import cv2
+import numpy as np
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Tuple, Callable, Sequence
+from pyzbar.pyzbar import decode as zbar_decode, ZBarSymbol
+from constants import MAX_FRAME_WIDTH, MAX_FRAME_HEIGHT, TEMPLATES_DIR, SUPPORTED_EXTENSIONS
+from preprocess import FrameCache
+from currency import (CurrencyClassifier, CurrencyReferences, CurrencyVoteTracker,
+                      candidate_scale, feature_bins, find_banknote_candidates, region_thumbnail)
+from matching import PyramidMatcher, FeatureIndex, COARSE_LEVEL
+from template_store import CompiledTemplate, TemplateStore, compile_template, store_directory
+
+# Детекторы не зависят от Kivy: их можно запускать вне приложения
+
+@dataclass
+class ObjectTemplate:
+    name: str
+    display_name: str
+    threshold: float
+    color: Tuple[int, int, int]
+    # 'pixels' — корреляция шаблона, 'features' — ORB-дескрипторы с гомографией
+    method: str = 'pixels'
+
+# Параметры поиска областей штрих-кодов на уменьшенном кадре
+BARCODE_MIN_AREA = 0.002  # доля площади кадра
+BARCODE_MAX_CANDIDATES = 4
+BARCODE_PADDING = 0.15
+# Пустой набор — все символики zbar; например ('QRCODE', 'EAN13') ускоряет поиск
+BARCODE_SYMBOLS: Tuple[str, ...] = ()
+
+def locate_barcode_regions(gray: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    # Штрих-коды и QR — области с плотным контрастным градиентом
+    grad_x = cv2.convertScaleAbs(cv2.Scharr(gray, cv2.CV_16S, 1, 0))
+    grad_y = cv2.convertScaleAbs(cv2.Scharr(gray, cv2.CV_16S, 0, 1))
+    gradient = cv2.addWeighted(grad_x, 0.5, grad_y, 0.5, 0)
+    blurred = cv2.blur(gradient, (9, 9))
+    _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    
+    # Склеиваем полосы и модули в сплошные пятна, убираем мелкий шум
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (15, 9))
+    closed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+    closed = cv2.erode(closed, None, iterations=3)
+    closed = cv2.dilate(closed, None, iterations=3)
+    
+    contours, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    min_area = BARCODE_MIN_AREA * gray.shape[0] * gray.shape[1]
+    boxes = []
+    for contour in contours:
+        if cv2.contourArea(contour) < min_area:
+            continue
+        x, y, w, h = cv2.boundingRect(contour)
+        if max(w, h) > 12 * min(w, h):
+            continue
+        boxes.append((w * h, (x, y, w, h)))
+    boxes.sort(reverse=True)
+    return [box for _, box in boxes[:BARCODE_MAX_CANDIDATES]]
+
+# Временное голосование по кодам: код сообщается только после N согласных
+# кадров, а события выдаются лишь при смене состояния (подтвержден / потерян)
+BARCODE_CONFIRM_HITS = 3
+BARCODE_RESULT_TTL = 5.0
+# Как долго подтвержденный код в том же месте не перечитывается через zbar
+BARCODE_REVERIFY_INTERVAL = 1.5
+
+class BarcodeResult:
+    __slots__ = ('type', 'data', 'hits', 'last_seen', 'last_decoded', 'confirmed', 'bbox', 'polygon')
+    
+    def __init__(self, detection: Dict, now: float):
+        self.type = detection['type']
+        self.data = detection['data']
+        self.hits = 0
+        self.last_seen = now
+        self.last_decoded = now
+        self.confirmed = False
+        self.bbox = detection['bbox']
+        self.polygon = detection['polygon']
+    
+    def as_detection(self) -> Dict:
+        return {
+            'type': self.type,
+            'data': self.data,
+            'bbox': self.bbox,
+            'polygon': self.polygon,
+            'confirmed': self.confirmed
+        }
+
+class BarcodeResultCache:
+    def __init__(self, confirm_hits: int = BARCODE_CONFIRM_HITS, ttl: float = BARCODE_RESULT_TTL):
+        self.confirm_hits = confirm_hits
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, str], BarcodeResult] = {}
+        self._events: List[Tuple[str, Dict]] = []
+        self._lock = threading.Lock()
+    
+    def observe(self, detections: List[Dict], decoded: bool = True,
+                now: Optional[float] = None) -> List[Dict]:
+        now = time.time() if now is None else now
+        with self._lock:
+            self._expire(now)
+            for detection in detections:
+                key = (detection['type'], detection['data'])
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = BarcodeResult(detection, now)
+                entry.last_seen = now
+                entry.bbox = detection['bbox']
+                entry.polygon = detection['polygon']
+                if decoded:
+                    entry.hits += 1
+                    entry.last_decoded = now
+                if not entry.confirmed and entry.hits >= self.confirm_hits:
+                    entry.confirmed = True
+                    self._events.append(('confirmed', entry.as_detection()))
+                detection['confirmed'] = entry.confirmed
+        return detections
+    
+    def lookup_region(self, region: Tuple[int, int, int, int],
+                      now: Optional[float] = None) -> Optional[Dict]:
+        # Подтвержденный и недавно перечитанный код, центр которого внутри области
+        now = time.time() if now is None else now
+        rx, ry, rw, rh = region
+        with self._lock:
+            for entry in self._entries.values():
+                if not entry.confirmed or now - entry.last_decoded > BARCODE_REVERIFY_INTERVAL:
+                    continue
+                x, y, w, h = entry.bbox
+                cx, cy = x + w / 2, y + h / 2
+                if rx <= cx <= rx + rw and ry <= cy <= ry + rh:
+                    return entry.as_detection()
+        return None
+    
+    def pop_events(self) -> List[Tuple[str, Dict]]:
+        with self._lock:
+            self._expire(time.time())
+            events, self._events = self._events, []
+        return events
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._events = []
+    
+    def _expire(self, now: float):
+        for key in [k for k, e in self._entries.items() if now - e.last_seen > self.ttl]:
+            entry = self._entries.pop(key)
+            if entry.confirmed:
+                self._events.append(('lost', entry.as_detection()))
+
+# Оптимизированный BarcodeReader с кэшированием
+class BarcodeReader:
+    def __init__(self, tts_callback: Optional[Callable] = None,
+                 symbols: Sequence[str] = BARCODE_SYMBOLS):
+        self.tts_callback = tts_callback
+        self._last_detection = None
+        self._last_detection_time = 0
+        self._cooldown = 3
+        self.symbols = None
+        self.set_symbols(symbols)
+        self.results = BarcodeResultCache()
+    
+    def set_symbols(self, symbols: Sequence[str]):
+        # Ограничение символик: zbar не перебирает ненужные декодеры
+        self.symbols = [ZBarSymbol[name] for name in symbols] or None
+    
+    def decode_barcodes(self, frame: np.ndarray, cache: Optional[FrameCache] = None,
+                        remember: bool = True) -> List[Dict]:
+        # remember=False — без голосования и памяти кодов (процесс-воркер пула)
+        detections = []
+        
+        try:
+            # Уменьшенный кадр берем из общего кэша
+            if cache is None:
+                cache = FrameCache(frame, max_width=MAX_FRAME_WIDTH, max_height=MAX_FRAME_HEIGHT)
+            
+            # Кандидаты ищем на уменьшенном кадре; нет кандидатов — zbar не вызывается
+            regions = locate_barcode_regions(cache.small_gray)
+            if not regions:
+                return detections
+            
+            scale_factor = 1 / cache.scale
+            gray = cache.gray
+            frame_h, frame_w = gray.shape[:2]
+            seen = set()
+            remembered = []
+            
+            for rx, ry, rw, rh in regions:
+                # Декодируем вырезку в полном разрешении — мелкие коды не теряются
+                pad_x, pad_y = int(rw * BARCODE_PADDING), int(rh * BARCODE_PADDING)
+                x0 = max(0, int((rx - pad_x) * scale_factor))
+                y0 = max(0, int((ry - pad_y) * scale_factor))
+                x1 = min(frame_w, int((rx + rw + pad_x) * scale_factor))
+                y1 = min(frame_h, int((ry + rh + pad_y) * scale_factor))
+                crop = gray[y0:y1, x0:x1]
+                if crop.size == 0:
+                    continue
+                
+                # Недавно подтвержденный код в этой области не перечитываем
+                known = self.results.lookup_region((x0, y0, x1 - x0, y1 - y0)) if remember else None
+                if known is not None:
+                    key = (known['type'], known['data'])
+                    if key not in seen:
+                        seen.add(key)
+                        remembered.append(known)
+                    continue
+                
+                # zbar работает с 8-битным полутоном: отдаем сырой буфер вырезки
+                # (pixels, width, height) без PIL и цветовых преобразований
+                pixels = crop.tobytes()
+                for obj in zbar_decode((pixels, crop.shape[1], crop.shape[0]), symbols=self.symbols):
+                    barcode_data = obj.data.decode('utf-8', errors='ignore')
+                    barcode_type = obj.type
+                    if (barcode_type, barcode_data) in seen:
+                        continue
+                    
+                    points = obj.polygon
+                    if len(points) == 4:
+                        seen.add((barcode_type, barcode_data))
+                        # Координаты в системе исходного кадра
+                        polygon = [(p.x + x0, p.y + y0) for p in points]
+                        left, top, width, height = obj.rect
+                        
+                        detections.append({
+                            'type': barcode_type,
+                            'data': barcode_data,
+                            'bbox': (left + x0, top + y0, width, height),
+                            'polygon': polygon
+                        })
+            
+            if remember:
+                self.results.observe(detections)
+                self.results.observe(remembered, decoded=False)
+                detections.extend(remembered)
+        
+        except Exception as e:
+            pass
+        
+        return detections
+    
+    def speak_barcode(self, detections: List[Dict]):
+        if not detections or not self.tts_callback:
+            return
+        
+        current_time = time.time()
+        if current_time - self._last_detection_time < self._cooldown:
+            return
+        
+        for detection in detections[:1]:
+            code_type = detection['type']
+            code_data = detection['data']
+            
+            if code_type == 'QRCODE':
+                text = f"QR код: {code_data[:50]}"
+            else:
+                text = f"Штрих код: {code_data[:50]}"
+            
+            self._last_detection_time = current_time
+            self.tts_callback(text)
+
+# Оптимизированный CurrencyRecognizer
+class CurrencyRecognizer:
+    # Номиналы и эталонные гистограммы лежат в data/currency_refs.json
+    REFERENCES = CurrencyReferences.load()
+    CURRENCY_DB = REFERENCES.names
+    MIN_CONFIDENCE = 0.35
+    
+    def __init__(self, tts_callback: Optional[Callable] = None):
+        self.tts_callback = tts_callback
+        self.currency_type = 'rub'
+        self.classifier = CurrencyClassifier(self.REFERENCES)
+        self.votes = CurrencyVoteTracker()
+        self._last_detection_time = 0
+        self._cooldown = 3
+    
+    def recognize_currency(self, frame: np.ndarray, cache: Optional[FrameCache] = None,
+                           vote: bool = True) -> List[Dict]:
+        # vote=False — разовый снимок: номинал по одному кадру, без голосования
+        detections = []
+        if not self.available():
+            return detections
+        
+        try:
+            if cache is None:
+                cache = FrameCache(frame, max_width=MAX_FRAME_WIDTH, max_height=MAX_FRAME_HEIGHT)
+            # Кандидаты ищутся на кадре фиксированной ширины и переносятся в полное разрешение
+            scale = candidate_scale(frame.shape[1])
+            gray = cache.derived('currency_gray', lambda: self._candidate_gray(cache, scale))
+            candidates = find_banknote_candidates(gray)
+            boxes = [tuple(int(round(v / scale)) for v in box) for box, _ in candidates]
+            polygons = [[(int(round(px / scale)), int(round(py / scale))) for px, py in quad]
+                        for _, quad in candidates]
+            
+            now = time.time()
+            if vote:
+                thumbs = [region_thumbnail(gray, box) for box, _ in candidates]
+                tracks = self.votes.match(boxes, thumbs, now)
+                # Неизменившиеся регионы не классифицируются повторно
+                pending = [i for i, (track, box, thumb) in enumerate(zip(tracks, boxes, thumbs))
+                           if not track.unchanged(box, thumb, now)]
+            else:
+                pending = list(range(len(boxes)))
+            
+            # Все кандидаты классифицируются одним вызовом по общей карте цветов
+            results = {}
+            if pending:
+                bins = cache.derived('currency_bins', lambda: feature_bins(cache.small))
+                classified = self.classifier.classify(frame, [boxes[i] for i in pending],
+                                                      self.currency_type, bins)
+                results = dict(zip(pending, classified))
+            
+            for i, (bbox, polygon) in enumerate(zip(boxes, polygons)):
+                if vote:
+                    result = results.get(i, tracks[i].last_result)
+                    result = self.votes.observe(tracks[i], bbox, thumbs[i], result, i in results, now)
+                else:
+                    result = results.get(i)
+                    if result is not None and result[1] < self.MIN_CONFIDENCE:
+                        result = None
+                if result is None:
+                    continue
+                detection = self._detection(result, bbox, polygon)
+                if detection:
+                    detections.append(detection)
+        
+        except Exception as e:
+            print(f"Currency recognition Error: {e}")
+        
+        return detections
+    
+    def stabilize(self, detections: List[Dict]) -> List[Dict]:
+        # Голосование по уже классифицированным регионам (результаты пула процессов)
+        now = time.time()
+        tracks = self.votes.match([d['bbox'] for d in detections], [None] * len(detections), now)
+        stable = []
+        for track, detection in zip(tracks, detections):
+            result = self.votes.observe(track, detection['bbox'], None,
+                                        (detection['nominal'], detection['confidence']), True, now)
+            if result is not None:
+                stable_detection = self._detection(result, detection['bbox'], detection.get('polygon'))
+                if stable_detection:
+                    stable.append(stable_detection)
+        return stable
+    
+    def _detection(self, result: Tuple[int, float], bbox, polygon=None) -> Optional[Dict]:
+        nominal, confidence = result
+        display_name = self.CURRENCY_DB.get(self.currency_type, {}).get(nominal, '')
+        if not display_name:
+            return None
+        detection = {
+            'currency': self.currency_type,
+            'nominal': nominal,
+            'display_name': display_name,
+            'confidence': confidence,
+            'bbox': bbox
+        }
+        if polygon is not None:
+            detection['polygon'] = polygon
+        return detection
+    
+    def pop_events(self) -> List[Tuple[str, Dict]]:
+        # Смена устойчивого номинала в регионе; для надписи и озвучки
+        events = []
+        for event, track in self.votes.pop_events():
+            detection = self._detection(track.winner, track.bbox) if track.winner else None
+            if detection:
+                events.append((event, detection))
+        return events
+    
+    @staticmethod
+    def _candidate_gray(cache: FrameCache, scale: float) -> np.ndarray:
+        # Уменьшаем уже готовый small_gray, а не полный кадр
+        small = cache.small_gray
+        h, w = cache.frame.shape[:2]
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        if small.shape[1] == size[0]:
+            return small
+        return cv2.resize(small, size, interpolation=cv2.INTER_AREA)
+    
+    def available(self, currency_type: Optional[str] = None) -> bool:
+        return self.REFERENCES.available(currency_type or self.currency_type)
+    
+    def set_currency(self, currency_type: str):
+        if currency_type in self.CURRENCY_DB:
+            self.currency_type = currency_type
+            self.votes.clear()
+    
+    def speak_currency(self, detection: Dict):
+        if detection and self.tts_callback:
+            current_time = time.time()
+            if current_time - self._last_detection_time >= self._cooldown:
+                self._last_detection_time = current_time
+                text = currency_phrase(detection['display_name'])
+                self.tts_callback(text)
+
+# Оптимизированный ObjectDetector
+class ObjectDetector:
+    OBJECT_TEMPLATES = {
+        'crosswalk': ObjectTemplate('crosswalk', 'Переход', 0.65, (0, 150, 0)),
+        'bus_stop': ObjectTemplate('bus_stop', 'Остановка', 0.6, (150, 0, 0)),
+        'medical_cross': ObjectTemplate('medical_cross', 'Крест', 0.7, (0, 0, 150))
+    }
+    
+    def __init__(self, tts_callback: Optional[Callable] = None):
+        self.templates: Dict[str, np.ndarray] = {}
+        self.matchers: Dict[str, PyramidMatcher] = {}
+        self.feature_index = FeatureIndex()
+        self.template_paths: Dict[str, str] = {}
+        # Шаблоны ставятся из фонового потока и окна загрузки, пока поток
+        # детектора ищет по ним: установка и поиск не пересекаются
+        self._templates_lock = threading.Lock()
+        # Скомпилированные шаблоны (уменьшение, пирамида, дескрипторы) между запусками
+        self.store = TemplateStore(store_directory(TEMPLATES_DIR))
+        self.last_detected: Dict[str, float] = {}
+        self.tts_callback = tts_callback
+        self.cooldown_time = 5
+    
+    def load_template(self, name: str, image_path: str) -> bool:
+        if name not in self.OBJECT_TEMPLATES:
+            return False
+        
+        method = self.OBJECT_TEMPLATES[name].method
+        try:
+            # Готовая запись хранилища открывается через mmap без декодирования JPEG
+            compiled = self.store.load(image_path, method)
+            if compiled is None:
+                compiled = compile_template(image_path, method)
+                if compiled is None:
+                    return False
+                self.store.put(image_path, compiled)
+            self._install_template(name, image_path, compiled)
+            return True
+        except:
+            pass
+        return False
+    
+    def _install_template(self, name: str, image_path: str, compiled: CompiledTemplate):
+        with self._templates_lock:
+            if compiled.method == 'features':
+                self.feature_index.add_features(name, compiled.points, compiled.descriptors,
+                                                compiled.template.shape[:2])
+                self.matchers.pop(name, None)
+            else:
+                # Масштабы и уровни пирамиды шаблона готовятся один раз при компиляции
+                self.matchers[name] = PyramidMatcher.from_variants(compiled.variants)
+                self.feature_index.remove(name)
+            self.templates[name] = compiled.template
+            # Новый словарь вместо изменения: его читают без блокировки (параметры пула)
+            self.template_paths = {**self.template_paths, name: image_path}
+    
+    def load_default_templates(self, directory: str = TEMPLATES_DIR) -> bool:
+        if not os.path.exists(directory):
+            try:
+                os.makedirs(directory)
+            except:
+                pass
+            return False
+        
+        if self.store.directory != store_directory(directory):
+            self.store = TemplateStore(store_directory(directory))
+        self.store.prune()
+        # Один listdir вместо проверки каждого расширения через os.path.exists
+        files = set(os.listdir(directory))
+        loaded = 0
+        for obj_name in self.OBJECT_TEMPLATES:
+            for ext in SUPPORTED_EXTENSIONS:
+                filename = f"{obj_name}{ext}"
+                if filename in files and self.load_template(obj_name, os.path.join(directory, filename)):
+                    loaded += 1
+                    break
+        return loaded > 0
+    
+    def detect_objects(self, frame: np.ndarray, cache: Optional[FrameCache] = None,
+                       announce: bool = True) -> List[Dict]:
+        if not self.templates:
+            return []
+        
+        # Пирамида уменьшенного полутонового кадра из общего кэша
+        if cache is None:
+            cache = FrameCache(frame, max_width=MAX_FRAME_WIDTH, max_height=MAX_FRAME_HEIGHT)
+        pyramid = cache.pyramid(COARSE_LEVEL + 1)
+        scale = cache.scale
+        
+        detections = []
+        
+        with self._templates_lock:
+            for obj_name, matcher in self.matchers.items():
+                obj_template = self.OBJECT_TEMPLATES.get(obj_name)
+                if not obj_template:
+                    continue
+                
+                # Все экземпляры выше порога, после подавления немаксимумов
+                for bx, by, bw, bh, score in matcher.match(pyramid, obj_template.threshold):
+                    # Масштабируем координаты обратно
+                    bbox = (int(bx / scale), int(by / scale), int(bw / scale), int(bh / scale))
+                    self._add_detection(obj_name, bbox, score, None, detections)
+            
+            if len(self.feature_index):
+                # Дескрипторы кадра считаются один раз и общие для всех шаблонов
+                points, descriptors = cache.derived(
+                    'orb', lambda: self.feature_index.detect(cache.small_gray))
+                for obj_name, corners, score in self.feature_index.match(points, descriptors):
+                    corners = corners / scale
+                    x, y, w, h = cv2.boundingRect(corners.astype(np.float32))
+                    polygon = [(int(px), int(py)) for px, py in corners]
+                    self._add_detection(obj_name, (x, y, w, h), score, polygon, detections)
+        
+        if announce:
+            self.announce(detections)
+        
+        return detections
+    
+    def _add_detection(self, obj_name: str, bbox: Tuple[int, int, int, int], score: float,
+                       polygon: Optional[List[Tuple[int, int]]], detections: List[Dict]):
+        obj_template = self.OBJECT_TEMPLATES[obj_name]
+        detection = {
+            'name': obj_name,
+            'display_name': obj_template.display_name,
+            'bbox': bbox,
+            'score': score
+        }
+        if polygon:
+            detection['polygon'] = polygon
+        detections.append(detection)
+    
+    def announce(self, detections: List[Dict]):
+        # Озвучка новых объектов с паузой между повторами одного объекта
+        new_detections = []
+        for detection in detections:
+            if self._should_speak(detection['name']):
+                new_detections.append(detection)
+                self.last_detected[detection['name']] = time.time()
+        if new_detections and self.tts_callback:
+            self._speak_detections(new_detections)
+    
+    def _should_speak(self, obj_name: str) -> bool:
+        if obj_name not in self.last_detected:
+            return True
+        return time.time() - self.last_detected[obj_name] > self.cooldown_time
+    
+    def _speak_detections(self, detections: List[Dict]):
+        if detections:
+            text = object_phrase([d['display_name'] for d in detections])
+            self.tts_callback(text)
+
+# Фразы озвучки собраны в одном месте, чтобы их можно было синтезировать заранее
+def currency_phrase(display_name: str) -> str:
+    return f"Купюра: {display_name}"
+
+def object_phrase(names: List[str]) -> str:
+    return f"Обнаружен {names[0]}" if len(names) == 1 else f"Обнаружены: {', '.join(names)}"
+
+def known_phrases() -> List[str]:
+    phrases = [object_phrase([t.display_name]) for t in ObjectDetector.OBJECT_TEMPLATES.values()]
+    for currency, names in CurrencyRecognizer.CURRENCY_DB.items():
+        if CurrencyRecognizer.REFERENCES.available(currency):
+            phrases.extend(currency_phrase(name) for name in names.values())
+    return phrases
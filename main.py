@@ -1,4 +1,7 @@
-import cv2
+import time
+from profiling import PROFILER, STARTUP
+_import_start = time.perf_counter()
+
 import numpy as np
 import os
 import threading
@@ -7,29 +10,29 @@ from kivy.uix.image import Image
 from kivy.graphics.texture import Texture
 from kivy.clock import Clock
 from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.label import Label
-from kivy.uix.button import Button
-from kivy.uix.togglebutton import ToggleButton
-from kivy.uix.filechooser import FileChooserListView
-from kivy.uix.popup import Popup
 from kivy.uix.tabbedpanel import TabbedPanel, TabbedPanelItem
 from kivy.uix.scrollview import ScrollView
 from kivy.core.window import Window
 from kivy.utils import platform
-from kivy.metrics import dp, sp
-from kivy.graphics import Color, RoundedRectangle
-from kivy.core.text import LabelBase, DEFAULT_FONT
-import tempfile
-from gtts import gTTS
-import time
-from dataclasses import dataclass
-from typing import Optional, List, Dict, Tuple, Callable
+from kivy.metrics import dp
+from kivy.graphics import Color, Line, Rectangle, InstructionGroup
+from kivy.core.text import Label as CoreLabel
+from typing import Optional
 import warnings
-from pyzbar.pyzbar import decode as zbar_decode
-from PIL import Image as PILImage
 import sys
 import gc
-from functools import lru_cache, partial
+from functools import partial
+# OpenCV, pyzbar, озвучка и файловый диалог импортируются при первом использовании:
+# на телефонах их загрузка занимает секунды до первого кадра
+from capture import BlankSource, CameraCapture, FrameRecorder, open_source
+from constants import MAX_FRAME_WIDTH, MAX_FRAME_HEIGHT, reference_currencies
+from pipeline import DetectionWorker, FrameRateGovernor
+from procpool import (DETECT_BARCODES, DETECT_CURRENCY, DETECT_OBJECTS, create_pool,
+                      pool_size_from_env)
+from ui import (AppConfig, COLORS, FONT_NAME, FONT_MEDIUM, StyledButton, StyledToggleButton,
+                ModernCard, ModernLabel)
+
+STARTUP.record('import.main', time.perf_counter() - _import_start)
 
 # Оптимизация для Android
 if platform == 'android':
@@ -38,594 +41,287 @@ if platform == 'android':
     request_permissions([Permission.CAMERA, Permission.WRITE_EXTERNAL_STORAGE, 
                         Permission.READ_EXTERNAL_STORAGE])
 
-# Упрощенное воспроизведение звука для Android
-try:
-    from android.media import MediaPlayer
-    ANDROID_MEDIA = True
-except:
-    ANDROID_MEDIA = False
-
-try:
-    from playsound import playsound
-    PLAYSOUND_AVAILABLE = True
-except ImportError:
-    PLAYSOUND_AVAILABLE = False
-
 warnings.filterwarnings('ignore')
 
 # Настройки для Android
 if platform == 'android':
     Window.softinput_mode = 'below_target'
-    # Ограничиваем разрешение для производительности
-    MAX_FRAME_WIDTH = 480
-    MAX_FRAME_HEIGHT = 360
-else:
-    MAX_FRAME_WIDTH = 640
-    MAX_FRAME_HEIGHT = 480
-
-# Настройка шрифтов
-if platform == 'android':
-    FONT_NAME = 'Roboto'
-    FONT_LIGHT = 'Roboto'
-    FONT_MEDIUM = 'Roboto'
-else:
-    FONT_NAME = DEFAULT_FONT
-    FONT_LIGHT = DEFAULT_FONT
-    FONT_MEDIUM = DEFAULT_FONT
 
-# Оптимизированная цветовая схема
-COLORS = {
-    'background': [0.98, 0.98, 1.0, 1],
-    'surface': [1, 1, 1, 1],
-    'primary': [0.0, 0.6, 0.9, 1],
-    'primary_dark': [0.0, 0.4, 0.7, 1],
-    'success': [0.2, 0.8, 0.4, 1],
-    'warning': [1.0, 0.6, 0.0, 1],
-    'error': [1.0, 0.3, 0.3, 1],
-    'purple': [0.6, 0.4, 0.9, 1],
-    'gold': [1.0, 0.8, 0.2, 1],
-    'card_shadow': [0.0, 0.0, 0.0, 0.1],
-    'card_border': [0.9, 0.95, 1.0, 1],
-    'text_primary': [0.1, 0.2, 0.4, 1],
-    'text_secondary': [0.4, 0.5, 0.7, 1],
-    'text_on_primary': [1, 1, 1, 1],
-}
+def bgr_to_rgba(color, alpha=1.0):
+    b, g, r = color[:3]
+    return [r / 255, g / 255, b / 255, alpha]
 
-@dataclass(frozen=True)
-class AppConfig:
-    CAMERA_ID: int = 0
-    FPS: float = 1/15  # Уменьшено для производительности
-    OCR_CONFIDENCE_THRESHOLD: float = 0.3
-    TEMPLATES_DIR: str = "templates"
-    SUPPORTED_EXTENSIONS: tuple = ('.jpg', '.jpeg', '.png', '.bmp')
-    
-    # Оптимизированные размеры для Android
-    BUTTON_HEIGHT: float = dp(48)
-    BUTTON_HEIGHT_SMALL: float = dp(40)
-    FONT_SIZE: float = sp(14)
-    FONT_SIZE_SMALL: float = sp(12)
-    FONT_SIZE_LARGE: float = sp(16)
-    FONT_SIZE_HEADER: float = sp(18)
-    PADDING: float = dp(8)
-    SPACING: float = dp(5)
-    BORDER_RADIUS: float = dp(8)
-    CARD_ELEVATION: float = dp(1)
-
-@dataclass
-class ObjectTemplate:
-    name: str
-    display_name: str
-    threshold: float
-    color: Tuple[int, int, int]
-
-# Оптимизированная кнопка с кэшированием
-class StyledButton(Button):
-    def __init__(self, color_type='primary', **kwargs):
-        super().__init__(**kwargs)
-        self.size_hint_y = None
-        self.height = AppConfig.BUTTON_HEIGHT
-        self.font_size = AppConfig.FONT_SIZE
-        self.bold = True
-        self.font_name = FONT_MEDIUM
-        self.background_normal = ''
-        self.background_down = ''
-        self.background_color = [0, 0, 0, 0]
-        self.color = COLORS['text_on_primary']
-        self.color_type = color_type
-        self._cached_bg = None
-        self.bind(pos=self._update_gradient, size=self._update_gradient)
-    
-    def _update_gradient(self, *args):
-        if self._cached_bg == (self.x, self.y, self.width, self.height, self.state):
-            return
-        self._cached_bg = (self.x, self.y, self.width, self.height, self.state)
-        
-        self.canvas.before.clear()
-        with self.canvas.before:
-            Color(*COLORS['card_shadow'])
-            RoundedRectangle(pos=(self.x + AppConfig.CARD_ELEVATION, 
-                                 self.y - AppConfig.CARD_ELEVATION),
-                           size=self.size,
-                           radius=[AppConfig.BORDER_RADIUS])
-            
-            color_map = {
-                'success': COLORS['success'],
-                'warning': COLORS['warning'],
-                'error': COLORS['error'],
-                'purple': COLORS['purple'],
-                'gold': COLORS['gold']
-            }
-            Color(*color_map.get(self.color_type, COLORS['primary']))
-            
-            RoundedRectangle(pos=self.pos, size=self.size,
-                           radius=[AppConfig.BORDER_RADIUS])
-            
-            if self.state == 'down':
-                Color(0, 0, 0, 0.1)
-                RoundedRectangle(pos=self.pos, size=self.size,
-                               radius=[AppConfig.BORDER_RADIUS])
+def bbox_points(bbox):
+    x, y, w, h = bbox
+    return [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
 
-class StyledToggleButton(ToggleButton):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.size_hint_y = None
-        self.height = AppConfig.BUTTON_HEIGHT
-        self.font_size = AppConfig.FONT_SIZE
-        self.bold = True
-        self.font_name = FONT_MEDIUM
-        self.background_normal = ''
-        self.background_down = ''
-        self.background_color = [0, 0, 0, 0]
-        self.color = COLORS['text_on_primary']
-        self._cached_bg = None
-        self.bind(pos=self._update_gradient, size=self._update_gradient, 
-                  state=self._update_state)
-    
-    def _update_gradient(self, *args):
-        if self._cached_bg == (self.x, self.y, self.width, self.height, self.state):
+# Векторный слой разметки поверх превью: рамки и подписи рисуются
+# инструкциями canvas, а не в копии кадра
+class DetectionOverlay:
+    def __init__(self, image_widget):
+        self.widget = image_widget
+        self._frame_size = None
+        self._items = []
+        self._label_textures = {}
+        self._group = InstructionGroup()
+        image_widget.canvas.after.add(self._group)
+        image_widget.bind(pos=self._redraw, size=self._redraw, texture_size=self._redraw)
+    
+    def update(self, frame_size, items):
+        # items: список (точки в координатах кадра, цвет rgba, подпись)
+        self._frame_size = frame_size
+        self._items = items
+        self._redraw()
+    
+    def clear(self):
+        self._items = []
+        self._group.clear()
+    
+    def _to_widget(self, x, y):
+        fw, fh = self._frame_size
+        nw, nh = self.widget.norm_image_size
+        left = self.widget.center_x - nw / 2
+        bottom = self.widget.center_y - nh / 2
+        # У кадра ось Y направлена вниз, у Kivy — вверх
+        return left + x * nw / fw, bottom + (fh - y) * nh / fh
+    
+    def _label_texture(self, text):
+        texture = self._label_textures.get(text)
+        if texture is None:
+            label = CoreLabel(text=text, font_size=AppConfig.FONT_SIZE_SMALL, font_name=FONT_MEDIUM)
+            label.refresh()
+            texture = label.texture
+            self._label_textures[text] = texture
+        return texture
+    
+    def _redraw(self, *args):
+        self._group.clear()
+        if not self._items or not self._frame_size or not self.widget.texture:
             return
-        self._cached_bg = (self.x, self.y, self.width, self.height, self.state)
         
-        self.canvas.before.clear()
-        with self.canvas.before:
-            Color(*COLORS['card_shadow'])
-            RoundedRectangle(pos=(self.x + AppConfig.CARD_ELEVATION, 
-                                 self.y - AppConfig.CARD_ELEVATION),
-                           size=self.size,
-                           radius=[AppConfig.BORDER_RADIUS])
+        for points, color, label in self._items:
+            widget_points = []
+            for x, y in points:
+                widget_points.extend(self._to_widget(x, y))
+            self._group.add(Color(*color))
+            self._group.add(Line(points=widget_points, close=True, width=dp(1.5)))
             
-            Color(*COLORS['primary_dark'] if self.state == 'down' else COLORS['primary'])
-            RoundedRectangle(pos=self.pos, size=self.size,
-                           radius=[AppConfig.BORDER_RADIUS])
-    
-    def _update_state(self, *args):
-        self._update_gradient()
+            if label:
+                texture = self._label_texture(label)
+                top = max(widget_points[1::2])
+                left = min(widget_points[0::2])
+                self._group.add(Rectangle(texture=texture, size=texture.size,
+                                          pos=(left, top + dp(2))))
 
-class ModernCard(BoxLayout):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.padding = AppConfig.PADDING
-        self.spacing = AppConfig.SPACING
-        self._cached_rect = None
-        self.bind(pos=self._update_rect, size=self._update_rect)
-    
-    def _update_rect(self, *args):
-        if self._cached_rect == (self.x, self.y, self.width, self.height):
+# Панель с замерами этапов в левом верхнем углу превью
+class ProfilerHud:
+    def __init__(self, image_widget):
+        self.widget = image_widget
+        self._group = InstructionGroup()
+        image_widget.canvas.after.add(self._group)
+    
+    def refresh(self, *args):
+        self._group.clear()
+        lines = PROFILER.report_lines()
+        if not lines:
             return
-        self._cached_rect = (self.x, self.y, self.width, self.height)
-        
-        self.canvas.before.clear()
-        with self.canvas.before:
-            Color(*COLORS['card_shadow'])
-            RoundedRectangle(pos=(self.x + AppConfig.CARD_ELEVATION, 
-                                 self.y - AppConfig.CARD_ELEVATION),
-                           size=self.size,
-                           radius=[AppConfig.BORDER_RADIUS])
-            Color(*COLORS['surface'])
-            RoundedRectangle(pos=self.pos, size=self.size,
-                           radius=[AppConfig.BORDER_RADIUS])
-            Color(*COLORS['card_border'])
-            RoundedRectangle(pos=self.pos, size=self.size,
-                           radius=[AppConfig.BORDER_RADIUS], line_width=1)
-
-class ModernLabel(Label):
-    def __init__(self, variant='primary', **kwargs):
-        super().__init__(**kwargs)
-        self.halign = 'left'
-        self.valign = 'top'
-        self.text_size = (None, None)
-        
-        variant_config = {
-            'primary': (COLORS['text_primary'], AppConfig.FONT_SIZE_LARGE, FONT_MEDIUM, True),
-            'secondary': (COLORS['text_secondary'], AppConfig.FONT_SIZE_SMALL, FONT_LIGHT, False),
-            'header': (COLORS['primary'], AppConfig.FONT_SIZE_HEADER, FONT_MEDIUM, True),
-            'success': (COLORS['success'], AppConfig.FONT_SIZE, FONT_MEDIUM, False),
-            'error': (COLORS['error'], AppConfig.FONT_SIZE, FONT_MEDIUM, False)
-        }
-        
-        if variant in variant_config:
-            self.color, self.font_size, self.font_name, self.bold = variant_config[variant]
-        
-        self.bind(size=self._update_text_size)
-    
-    def _update_text_size(self, *args):
-        self.text_size = (self.width - AppConfig.PADDING * 2, None)
-
-# Оптимизированный TTS для Android
-class TextToSpeech:
-    def __init__(self):
-        self._lock = threading.Lock()
-        self._last_speak_time = 0
-        self._min_interval = 2  # Минимальный интервал между озвучиваниями
-    
-    def speak_text(self, text: str, lang: str = 'ru'):
-        if not text or not self._can_speak():
-            return
-        
-        current_time = time.time()
-        if current_time - self._last_speak_time < self._min_interval:
-            return
-        
-        self._last_speak_time = current_time
-        
-        with self._lock:
-            try:
-                if ANDROID_MEDIA and platform == 'android':
-                    # Оптимизированный способ для Android
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as f:
-                        audio_file = f.name
-                    
-                    tts = gTTS(text=text, lang=lang, slow=False)
-                    tts.save(audio_file)
-                    
-                    try:
-                        media_player = MediaPlayer()
-                        media_player.setDataSource(audio_file)
-                        media_player.prepare()
-                        media_player.start()
-                        # Даем время на воспроизведение
-                        time.sleep(len(text) * 0.1 + 1)
-                        media_player.release()
-                    except:
-                        pass
-                    
-                    try:
-                        os.unlink(audio_file)
-                    except:
-                        pass
-                elif PLAYSOUND_AVAILABLE:
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as f:
-                        audio_file = f.name
-                    tts = gTTS(text=text, lang=lang, slow=False)
-                    tts.save(audio_file)
-                    playsound(audio_file)
-                    try:
-                        os.unlink(audio_file)
-                    except:
-                        pass
-            except Exception as e:
-                print(f"TTS Error: {e}")
-    
-    def _can_speak(self):
-        current_time = time.time()
-        return current_time - self._last_speak_time >= self._min_interval
-    
-    def stop_speaking(self):
-        pass
-
-# Оптимизированный BarcodeReader с кэшированием
-class BarcodeReader:
-    def __init__(self, tts_callback: Optional[Callable] = None):
-        self.tts_callback = tts_callback
-        self._last_detection = None
-        self._last_detection_time = 0
-        self._cooldown = 3
-    
-    def decode_barcodes(self, frame: np.ndarray) -> Tuple[np.ndarray, List[Dict]]:
-        result = frame.copy()
-        detections = []
-        
-        try:
-            # Уменьшаем разрешение для скорости
-            h, w = frame.shape[:2]
-            if w > MAX_FRAME_WIDTH:
-                scale = MAX_FRAME_WIDTH / w
-                new_w = MAX_FRAME_WIDTH
-                new_h = int(h * scale)
-                small_frame = cv2.resize(frame, (new_w, new_h))
-            else:
-                small_frame = frame
-            
-            pil_image = PILImage.fromarray(cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB))
-            decoded_objects = zbar_decode(pil_image)
-            
-            scale_factor = w / small_frame.shape[1] if w > MAX_FRAME_WIDTH else 1
-            
-            for obj in decoded_objects:
-                barcode_data = obj.data.decode('utf-8', errors='ignore')
-                barcode_type = obj.type
-                
-                points = obj.polygon
-                if len(points) == 4:
-                    pts = np.array([(int(p.x * scale_factor), int(p.y * scale_factor)) 
-                                   for p in points], np.int32)
-                    pts = pts.reshape((-1, 1, 2))
-                    
-                    color = tuple(int(c * 255) for c in COLORS['purple'][:3])
-                    cv2.polylines(result, [pts], True, color, 2)
-                    
-                    display_text = f"{barcode_type}"
-                    cv2.putText(result, display_text, 
-                              (pts[0][0][0], pts[0][0][1] - 5),
-                              cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
-                    
-                    detections.append({
-                        'type': barcode_type,
-                        'data': barcode_data,
-                        'bbox': obj.rect
-                    })
-        
-        except Exception as e:
-            pass
-        
-        return result, detections
-    
-    def speak_barcode(self, detections: List[Dict]):
-        if not detections or not self.tts_callback:
-            return
-        
-        current_time = time.time()
-        if current_time - self._last_detection_time < self._cooldown:
-            return
-        
-        for detection in detections[:1]:
-            code_type = detection['type']
-            code_data = detection['data']
-            
-            if code_type == 'QRCODE':
-                text = f"QR код: {code_data[:50]}"
-            else:
-                text = f"Штрих код: {code_data[:50]}"
-            
-            self._last_detection_time = current_time
-            threading.Thread(target=self.tts_callback, args=(text,), daemon=True).start()
-
-# Оптимизированный CurrencyRecognizer
-class CurrencyRecognizer:
-    CURRENCY_DB = {
-        'rub': {
-            10: '10 рублей', 50: '50 рублей', 100: '100 рублей',
-            200: '200 рублей', 500: '500 рублей', 1000: '1000 рублей',
-            2000: '2000 рублей', 5000: '5000 рублей'
-        },
-        'usd': {
-            1: '1 доллар', 2: '2 доллара', 5: '5 долларов',
-            10: '10 долларов', 20: '20 долларов', 50: '50 долларов',
-            100: '100 долларов'
-        },
-        'eur': {
-            5: '5 евро', 10: '10 евро', 20: '20 евро',
-            50: '50 евро', 100: '100 евро', 200: '200 евро',
-            500: '500 евро'
-        }
-    }
-    
-    def __init__(self, tts_callback: Optional[Callable] = None):
-        self.tts_callback = tts_callback
-        self.currency_type = 'rub'
-        self._last_detection_time = 0
-        self._cooldown = 3
-    
-    def recognize_currency(self, frame: np.ndarray) -> Tuple[np.ndarray, List[Dict]]:
-        result = frame.copy()
-        detections = []
-        
-        try:
-            # Быстрое обнаружение прямоугольников
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            _, thresh = cv2.threshold(gray, 120, 255, cv2.THRESH_BINARY)
-            contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, 
-                                          cv2.CHAIN_APPROX_SIMPLE)
-            
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                if area < 5000:  # Минимальная площадь
-                    continue
-                
-                x, y, w, h = cv2.boundingRect(contour)
-                aspect_ratio = max(w, h) / min(w, h)
-                
-                if 1.5 < aspect_ratio < 3.0:
-                    # Быстрое определение цвета
-                    roi = frame[y:y+h, x:x+w]
-                    avg_color = np.mean(roi, axis=(0, 1))
-                    
-                    nominal = 100  # По умолчанию
-                    if self.currency_type == 'rub':
-                        if avg_color[2] > 150:
-                            nominal = 5000
-                        elif avg_color[0] > 150:
-                            nominal = 2000
-                        elif avg_color[1] > 150:
-                            nominal = 100
-                        else:
-                            nominal = 500
-                    
-                    display_name = self.CURRENCY_DB.get(self.currency_type, {}).get(nominal, '')
-                    if display_name:
-                        color = tuple(int(c * 255) for c in COLORS['gold'][:3])
-                        cv2.rectangle(result, (x, y), (x + w, y + h), color, 2)
-                        cv2.putText(result, display_name, (x, y - 5),
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
-                        
-                        detections.append({
-                            'currency': self.currency_type,
-                            'nominal': nominal,
-                            'display_name': display_name
-                        })
-        
-        except Exception as e:
-            pass
-        
-        return result, detections
-    
-    def set_currency(self, currency_type: str):
-        if currency_type in self.CURRENCY_DB:
-            self.currency_type = currency_type
-    
-    def speak_currency(self, detection: Dict):
-        if detection and self.tts_callback:
-            current_time = time.time()
-            if current_time - self._last_detection_time >= self._cooldown:
-                self._last_detection_time = current_time
-                text = f"Купюра: {detection['display_name']}"
-                threading.Thread(target=self.tts_callback, args=(text,), daemon=True).start()
-
-# Оптимизированный ObjectDetector
-class ObjectDetector:
-    OBJECT_TEMPLATES = {
-        'crosswalk': ObjectTemplate('crosswalk', 'Переход', 0.65, (0, 150, 0)),
-        'bus_stop': ObjectTemplate('bus_stop', 'Остановка', 0.6, (150, 0, 0)),
-        'medical_cross': ObjectTemplate('medical_cross', 'Крест', 0.7, (0, 0, 150))
-    }
-    
-    def __init__(self, tts_callback: Optional[Callable] = None):
-        self.templates: Dict[str, np.ndarray] = {}
-        self.last_detected: Dict[str, float] = {}
-        self.tts_callback = tts_callback
-        self.cooldown_time = 5
-    
-    def load_template(self, name: str, image_path: str) -> bool:
-        if name not in self.OBJECT_TEMPLATES:
-            return False
-        
-        try:
-            template = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-            if template is not None:
-                # Уменьшаем размер шаблона для скорости
-                if template.shape[0] > 100 or template.shape[1] > 100:
-                    scale = min(100 / template.shape[0], 100 / template.shape[1])
-                    new_w = int(template.shape[1] * scale)
-                    new_h = int(template.shape[0] * scale)
-                    template = cv2.resize(template, (new_w, new_h))
-                self.templates[name] = template
-                return True
-        except:
-            pass
-        return False
-    
-    def load_default_templates(self) -> bool:
-        if not os.path.exists(AppConfig.TEMPLATES_DIR):
-            try:
-                os.makedirs(AppConfig.TEMPLATES_DIR)
-            except:
-                pass
-            return False
-        
-        loaded = 0
-        for obj_name in self.OBJECT_TEMPLATES:
-            for ext in AppConfig.SUPPORTED_EXTENSIONS:
-                path = os.path.join(AppConfig.TEMPLATES_DIR, f"{obj_name}{ext}")
-                if os.path.exists(path) and self.load_template(obj_name, path):
-                    loaded += 1
-                    break
-        return loaded > 0
-    
-    def detect_objects(self, frame: np.ndarray) -> Tuple[np.ndarray, List[Dict]]:
-        if not self.templates:
-            return frame, []
-        
-        result = frame.copy()
-        h, w = frame.shape[:2]
-        
-        # Уменьшаем кадр для детекции
-        scale = min(MAX_FRAME_WIDTH / w, MAX_FRAME_HEIGHT / h, 1.0)
-        if scale < 1.0:
-            small_h, small_w = int(h * scale), int(w * scale)
-            small_frame = cv2.resize(frame, (small_w, small_h))
-            gray_small = cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
-        else:
-            gray_small = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            scale = 1.0
-        
-        detections = []
-        new_detections = []
-        
-        for obj_name, template in self.templates.items():
-            if gray_small.shape[0] < template.shape[0] or gray_small.shape[1] < template.shape[1]:
-                continue
-            
-            match = cv2.matchTemplate(gray_small, template, cv2.TM_CCOEFF_NORMED)
-            _, max_val, _, max_loc = cv2.minMaxLoc(match)
-            obj_template = self.OBJECT_TEMPLATES.get(obj_name)
-            
-            if obj_template and max_val > obj_template.threshold:
-                # Масштабируем координаты обратно
-                x, y = int(max_loc[0] / scale), int(max_loc[1] / scale)
-                tw, th = int(template.shape[1] / scale), int(template.shape[0] / scale)
-                
-                detection = {
-                    'name': obj_name,
-                    'display_name': obj_template.display_name,
-                    'bbox': ((x, y), (x + tw, y + th))
-                }
-                detections.append(detection)
-                
-                cv2.rectangle(result, (x, y), (x + tw, y + th), obj_template.color, 2)
-                cv2.putText(result, obj_template.display_name, (x, y - 5),
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.4, obj_template.color, 1)
-                
-                if self._should_speak(obj_name):
-                    new_detections.append(detection)
-                    self.last_detected[obj_name] = time.time()
-        
-        if new_detections and self.tts_callback:
-            self._speak_detections(new_detections)
-        
-        return result, detections
-    
-    def _should_speak(self, obj_name: str) -> bool:
-        if obj_name not in self.last_detected:
-            return True
-        return time.time() - self.last_detected[obj_name] > self.cooldown_time
-    
-    def _speak_detections(self, detections: List[Dict]):
-        if detections:
-            names = [d['display_name'] for d in detections]
-            text = f"Обнаружен {names[0]}" if len(names) == 1 else f"Обнаружены: {', '.join(names)}"
-            threading.Thread(target=self.tts_callback, args=(text,), daemon=True).start()
+        label = CoreLabel(text='\n'.join(lines), font_size=AppConfig.FONT_SIZE_SMALL,
+                          font_name=FONT_NAME)
+        label.refresh()
+        texture = label.texture
+        pad = dp(4)
+        left = self.widget.x + pad
+        bottom = self.widget.top - texture.height - pad
+        self._group.add(Color(0, 0, 0, 0.55))
+        self._group.add(Rectangle(pos=(left - pad, bottom - pad),
+                                  size=(texture.width + 2 * pad, texture.height + 2 * pad)))
+        self._group.add(Color(1, 1, 1, 1))
+        self._group.add(Rectangle(texture=texture, size=texture.size, pos=(left, bottom)))
+    
+    def clear(self):
+        self._group.clear()
 
 # Оптимизированные вкладки с общим кодом
 class BaseTab(TabbedPanelItem):
+    # Детектор вкладки в пуле процессов; None — только внутрипроцессный режим
+    pool_task = None
+    # Вкладка без детектора показывает только превью
+    has_detector = True
+    # Трекинг между запусками детектора. Вкладкам с голосованием по кадрам он
+    # мешает: голоса копятся только на полных детекциях, раз в REDETECT_INTERVAL кадров
+    use_tracker = True
+    
     def __init__(self, app, tab_text, **kwargs):
         super().__init__(**kwargs)
         self.app = app
         self.text = tab_text
         self.is_active = False
         self._update_interval = None
+        self._preview_event = None
+        # Последние показанный и отправленный кадры: один кадр не обрабатывается дважды
+        self._shown_frame_id = None
+        self._submitted_frame_id = None
+        self.overlay = None
+        self.hud = None
+        self._hud_event = None
+        self.stage_name = f"detect.{self.pool_task or 'tab'}"
+        # Детекция с трекингом между полными запусками детектора; трекер создается
+        # при первом запуске камеры вместе с импортом OpenCV
+        self.tracker = None
+        self.governor = FrameRateGovernor(
+            AppConfig.FPS, AppConfig.MIN_FRAME_INTERVAL, AppConfig.MAX_FRAME_INTERVAL,
+            AppConfig.IDLE_FRAME_INTERVAL, AppConfig.IDLE_AFTER, AppConfig.PROCESSING_BUDGET)
+    
+    def ensure_built(self):
+        # Виджеты вкладки строятся при первом выборе, а не при запуске приложения
+        if self.content is None:
+            with STARTUP.phase(f"build.{type(self).__name__}"):
+                self._build_ui()
+    
+    def _build_ui(self):
+        raise NotImplementedError
     
     def start_camera(self):
-        if not self.is_active and hasattr(self, 'update_frame'):
+        if not self.is_active and hasattr(self, 'image_widget'):
             self.is_active = True
-            self._update_interval = Clock.schedule_interval(self.update_frame, AppConfig.FPS)
+            if self.use_tracker:
+                if self.tracker is None:
+                    from tracking import DetectThenTrack
+                    self.tracker = DetectThenTrack()
+                self.tracker.reset()
+            self.governor.reset()
+            self._shown_frame_id = None
+            self._submitted_frame_id = None
+            self.on_start()
+            # Превью с постоянной частотой, детектор — с частотой регулятора
+            self._preview_event = Clock.schedule_interval(self._preview, AppConfig.PREVIEW_INTERVAL)
+            if self.has_detector:
+                self._update_interval = Clock.schedule_once(self._tick, self.governor.interval)
+            if PROFILER.enabled and AppConfig.PROFILE_HUD:
+                if self.hud is None:
+                    self.hud = ProfilerHud(self.image_widget)
+                self._hud_event = Clock.schedule_interval(self.hud.refresh, AppConfig.PROFILE_HUD_INTERVAL)
     
     def stop_camera(self):
-        if self.is_active and self._update_interval:
-            Clock.unschedule(self._update_interval)
+        if self.is_active:
             self.is_active = False
+            self._preview_event.cancel()
+            self._preview_event = None
+            if self._update_interval:
+                Clock.unschedule(self._update_interval)
+            if self.overlay:
+                self.overlay.clear()
+            if self._hud_event:
+                self._hud_event.cancel()
+                self._hud_event = None
+                self.hud.clear()
             if hasattr(self, 'image_widget'):
                 self.image_widget.texture = None
             self._update_interval = None
     
     def on_leave(self):
         self.stop_camera()
+    
+    def _preview(self, dt):
+        # Без детектора кадры забирает превью, иначе воспроизведение с speed=0 стоит
+        packet = self.app.get_current_packet() if self.has_detector else self.app.take_packet()
+        # Источник еще не дал нового кадра — текстура уже актуальна
+        if packet is None or packet.frame_id == self._shown_frame_id:
+            return
+        self._shown_frame_id = packet.frame_id
+        with PROFILER.span('frame'):
+            self.app.display_frame(packet.frame, self.image_widget)
+    
+    def _tick(self, dt):
+        # Самоперепланирование: следующий интервал выбирает регулятор
+        if not self.is_active:
+            return
+        start = time.perf_counter()
+        with PROFILER.span('submit'):
+            self.submit_frame()
+        self.governor.record_tick(time.perf_counter() - start)
+        self._update_interval = Clock.schedule_once(self._tick, self.governor.next_interval())
+    
+    def submit_frame(self):
+        # Только детектор забирает кадр: воспроизведение с speed=0 идет в его темпе
+        packet = self.app.take_packet()
+        if packet is None or packet.frame_id == self._submitted_frame_id:
+            return
+        self._submitted_frame_id = packet.frame_id
+        
+        # Детектор работает в фоне и не задерживает превью
+        pool = self.app.detection_pool
+        if pool is not None and self.pool_task is not None:
+            pool.submit(packet, self.pool_task, self.pool_params(), self._post_pooled)
+        else:
+            self.app.detection_worker.submit(packet, self._detect_packet, self._post_detections)
+    
+    def on_start(self):
+        pass
+    
+    def pool_params(self):
+        return {}
+    
+    def after_pool(self, detections):
+        # Состояние между кадрами (голосование, озвучка) остается в главном процессе
+        return detections
+    
+    def _post_pooled(self, packet, detections, latency):
+        # Кадры в пуле обрабатываются параллельно, трекер между ними не используется.
+        # Задержка пула не замедляет постановку кадров: ограничением служит
+        # заполненное кольцо разделяемой памяти, иначе в работе был бы один кадр
+        PROFILER.record(self.stage_name, latency)
+        self._post_detections(packet, self.after_pool(detections))
+    
+    def run_detector(self, frame, cache):
+        raise NotImplementedError
+    
+    def _detect_packet(self, packet):
+        # Все детекторы одного кадра делят общий кэш предобработки
+        start = time.perf_counter()
+        cache = self.app.frame_caches.get(packet.frame_id, packet.frame)
+        
+        def detect():
+            with PROFILER.span(self.stage_name):
+                return self.run_detector(packet.frame, cache)
+        
+        with PROFILER.span('worker'):
+            detections = self.tracker.process(cache, detect) if self.use_tracker else detect()
+        self.governor.record_detection(time.perf_counter() - start)
+        return detections
+    
+    def on_detections(self, detections):
+        pass
+    
+    def overlay_item(self, detection):
+        raise NotImplementedError
+    
+    def show_detections(self, frame, detections):
+        if self.overlay:
+            h, w = frame.shape[:2]
+            with PROFILER.span('overlay'):
+                self.overlay.update((w, h), [self.overlay_item(d) for d in detections])
+    
+    def _post_detections(self, packet, detections):
+        # Вызывается из потока детектора — передаем результат в главный поток
+        Clock.schedule_once(lambda dt: self._deliver_detections(packet, detections))
+    
+    def _deliver_detections(self, packet, detections):
+        if not self.is_active:
+            return
+        self.governor.observe(len(detections))
+        self.show_detections(packet.frame, detections)
+        self.on_detections(detections)
 
 class BarcodeTab(BaseTab):
+    pool_task = DETECT_BARCODES
+    # Повторное чтение кода в том же месте и так пропускается кэшем результатов
+    use_tracker = False
+    
     def __init__(self, app, **kwargs):
         super().__init__(app, '📱 Коды', **kwargs)
         self.auto_speak = False
         self.last_detection = None
-        self._build_ui()
     
     def _build_ui(self):
         layout = BoxLayout(orientation='vertical', padding=AppConfig.PADDING, spacing=AppConfig.SPACING)
@@ -633,6 +329,7 @@ class BarcodeTab(BaseTab):
         # Видео
         video_card = ModernCard(orientation='vertical', size_hint=(1, 0.5))
         self.image_widget = Image(size_hint=(1, 1), keep_ratio=True, allow_stretch=True)
+        self.overlay = DetectionOverlay(self.image_widget)
         video_card.add_widget(self.image_widget)
         layout.add_widget(video_card)
         
@@ -682,17 +379,27 @@ class BarcodeTab(BaseTab):
         self.auto_speak = instance.state == 'down'
         instance.text = '🎤 Авто ВКЛ' if self.auto_speak else '🎤 Авто'
     
-    def update_frame(self, dt):
-        frame = self.app.get_current_frame()
-        if frame is not None:
-            processed, detections = self.app.barcode_reader.decode_barcodes(frame)
-            if detections:
-                self.last_detection = detections[0]
-                self.result_label.text = f"{detections[0]['type']}\n{detections[0]['data'][:50]}"
-                self.result_label.color = COLORS['purple']
-                if self.auto_speak:
-                    self.app.barcode_reader.speak_barcode(detections)
-            self.app.display_frame(processed, self.image_widget)
+    def on_start(self):
+        self.app.barcode_reader.results.clear()
+    
+    def run_detector(self, frame, cache):
+        return self.app.barcode_reader.decode_barcodes(frame, cache)
+    
+    def after_pool(self, detections):
+        return self.app.barcode_reader.results.observe(detections)
+    
+    def overlay_item(self, detection):
+        return detection['polygon'], COLORS['purple'], detection['type']
+    
+    def on_detections(self, detections):
+        # Надпись и озвучка меняются только при подтверждении нового кода
+        for event, detection in self.app.barcode_reader.results.pop_events():
+            if event != 'confirmed':
+                continue
+            self.last_detection = detection
+            self._update_result(detection)
+            if self.auto_speak:
+                self.app.barcode_reader.speak_barcode([detection])
     
     def scan_barcode(self, instance):
         frame = self.app.get_current_frame()
@@ -703,16 +410,20 @@ class BarcodeTab(BaseTab):
     
     def _scan(self, frame):
         try:
-            processed, detections = self.app.barcode_reader.decode_barcodes(frame)
+            detections = self.app.barcode_reader.decode_barcodes(frame)
             if detections:
                 self.last_detection = detections[0]
                 Clock.schedule_once(lambda dt: self._update_result(detections[0]))
             else:
                 Clock.schedule_once(lambda dt: self._update_no_result())
-            Clock.schedule_once(lambda dt: self.app.display_frame(processed, self.image_widget))
+            Clock.schedule_once(lambda dt: self._show_scan(frame, detections))
         except:
             Clock.schedule_once(lambda dt: self._update_error())
     
+    def _show_scan(self, frame, detections):
+        self.app.display_frame(frame, self.image_widget)
+        self.show_detections(frame, detections)
+    
     def _update_result(self, detection):
         self.result_label.text = f"{detection['type']}\n{detection['data'][:50]}"
         self.result_label.color = COLORS['purple']
@@ -726,17 +437,21 @@ class BarcodeTab(BaseTab):
         self.result_label.color = COLORS['error']
 
 class CurrencyTab(BaseTab):
+    pool_task = DETECT_CURRENCY
+    # Неизменившиеся области и так не классифицируются повторно
+    use_tracker = False
+    
     def __init__(self, app, **kwargs):
         super().__init__(app, '💰 Купюры', **kwargs)
         self.auto_speak = False
         self.last_detection = None
-        self._build_ui()
     
     def _build_ui(self):
         layout = BoxLayout(orientation='vertical', padding=AppConfig.PADDING, spacing=AppConfig.SPACING)
         
         video_card = ModernCard(orientation='vertical', size_hint=(1, 0.45))
         self.image_widget = Image(size_hint=(1, 1), keep_ratio=True, allow_stretch=True)
+        self.overlay = DetectionOverlay(self.image_widget)
         video_card.add_widget(self.image_widget)
         layout.add_widget(video_card)
         
@@ -765,6 +480,9 @@ class CurrencyTab(BaseTab):
         currency_layout.add_widget(self.rub_btn)
         currency_layout.add_widget(self.usd_btn)
         currency_layout.add_widget(self.eur_btn)
+        # Валюту без эталонов выбрать нельзя
+        for currency, button in (('rub', self.rub_btn), ('usd', self.usd_btn), ('eur', self.eur_btn)):
+            button.disabled = currency not in self.app.reference_currencies
         
         btn_layout.add_widget(self.camera_btn)
         btn_layout.add_widget(self.recognize_btn)
@@ -806,38 +524,66 @@ class CurrencyTab(BaseTab):
         self.rub_btn.state = 'down' if currency_type == 'rub' else 'normal'
         self.usd_btn.state = 'down' if currency_type == 'usd' else 'normal'
         self.eur_btn.state = 'down' if currency_type == 'eur' else 'normal'
+        self._check_references()
     
-    def update_frame(self, dt):
-        frame = self.app.get_current_frame()
-        if frame is not None:
-            processed, detections = self.app.currency_recognizer.recognize_currency(frame)
-            if detections:
-                self.last_detection = detections[0]
-                self.result_label.text = f"💰 {detections[0]['display_name']}"
-                self.result_label.color = COLORS['gold']
-                if self.auto_speak:
-                    self.app.currency_recognizer.speak_currency(detections[0])
-            self.app.display_frame(processed, self.image_widget)
+    def _check_references(self):
+        # Без эталонов из настоящих фотографий купюры не распознаются
+        if self.app.currency_recognizer.available():
+            return True
+        self.result_label.text = "⚠️ Нет эталонов для этой валюты\n(python currency.py <папка с фото>)"
+        self.result_label.color = COLORS['warning']
+        return False
+    
+    def run_detector(self, frame, cache):
+        return self.app.currency_recognizer.recognize_currency(frame, cache)
+    
+    def pool_params(self):
+        return {'currency': self.app.currency_recognizer.currency_type}
+    
+    def after_pool(self, detections):
+        return self.app.currency_recognizer.stabilize(detections)
+    
+    def overlay_item(self, detection):
+        points = detection.get('polygon') or bbox_points(detection['bbox'])
+        return points, COLORS['gold'], detection['display_name']
+    
+    def on_start(self):
+        self.app.currency_recognizer.votes.clear()
+        if self.app.currency_recognizer.currency_type not in self.app.reference_currencies:
+            self.set_currency(sorted(self.app.reference_currencies)[0])
+        self._check_references()
+    
+    def on_detections(self, detections):
+        # Надпись и озвучка меняются только когда номинал устойчиво победил в голосовании
+        for event, detection in self.app.currency_recognizer.pop_events():
+            self.last_detection = detection
+            self._update_result(detection)
+            if self.auto_speak:
+                self.app.currency_recognizer.speak_currency(detection)
     
     def recognize_currency(self, instance):
         frame = self.app.get_current_frame()
-        if frame is not None:
+        if frame is not None and self._check_references():
             self.result_label.text = "⏳ Распознавание..."
             self.result_label.color = COLORS['text_secondary']
             threading.Thread(target=self._recognize, args=(frame.copy(),), daemon=True).start()
     
     def _recognize(self, frame):
         try:
-            processed, detections = self.app.currency_recognizer.recognize_currency(frame)
+            detections = self.app.currency_recognizer.recognize_currency(frame, vote=False)
             if detections:
                 self.last_detection = detections[0]
                 Clock.schedule_once(lambda dt: self._update_result(detections[0]))
             else:
                 Clock.schedule_once(lambda dt: self._update_no_result())
-            Clock.schedule_once(lambda dt: self.app.display_frame(processed, self.image_widget))
+            Clock.schedule_once(lambda dt: self._show_scan(frame, detections))
         except:
             Clock.schedule_once(lambda dt: self._update_error())
     
+    def _show_scan(self, frame, detections):
+        self.app.display_frame(frame, self.image_widget)
+        self.show_detections(frame, detections)
+    
     def _update_result(self, detection):
         self.result_label.text = f"💰 {detection['display_name']}"
         self.result_label.color = COLORS['gold']
@@ -851,9 +597,10 @@ class CurrencyTab(BaseTab):
         self.result_label.color = COLORS['error']
 
 class ObjectDetectionTab(BaseTab):
+    pool_task = DETECT_OBJECTS
+    
     def __init__(self, app, **kwargs):
         super().__init__(app, '🎯 Детектор', **kwargs)
-        self._build_ui()
     
     def _build_ui(self):
         layout = BoxLayout(orientation='vertical', padding=AppConfig.PADDING, spacing=AppConfig.SPACING)
@@ -871,6 +618,7 @@ class ObjectDetectionTab(BaseTab):
         # Видео
         video_card = ModernCard(orientation='vertical', size_hint=(1, 0.55))
         self.image_widget = Image(size_hint=(1, 1), keep_ratio=True, allow_stretch=True)
+        self.overlay = DetectionOverlay(self.image_widget)
         video_card.add_widget(self.image_widget)
         layout.add_widget(video_card)
         
@@ -897,98 +645,124 @@ class ObjectDetectionTab(BaseTab):
             self.stop_camera()
             instance.text = '▶ Камера'
     
-    def update_frame(self, dt):
-        frame = self.app.get_current_frame()
-        if frame is not None:
-            processed, detections = self.app.detector.detect_objects(frame)
-            self.app.last_detections = detections
-            
-            if detections:
-                names = [d['display_name'] for d in detections[:2]]
-                text = "🔍 " + ", ".join(names)
-                if len(detections) > 2:
-                    text += f" +{len(detections)-2}"
-                self.status_label.text = text
-                self.status_label.color = COLORS['success']
-            else:
-                self.status_label.text = "🔍 Поиск..."
-                self.status_label.color = COLORS['text_secondary']
-            
-            self.app.display_frame(processed, self.image_widget)
+    def run_detector(self, frame, cache):
+        return self.app.detector.detect_objects(frame, cache)
+    
+    def pool_params(self):
+        return {'templates': dict(self.app.detector.template_paths)}
+    
+    def after_pool(self, detections):
+        self.app.detector.announce(detections)
+        return detections
+    
+    def overlay_item(self, detection):
+        obj_template = self.app.detector.OBJECT_TEMPLATES[detection['name']]
+        points = detection.get('polygon') or bbox_points(detection['bbox'])
+        return points, bgr_to_rgba(obj_template.color), detection['display_name']
+    
+    def on_detections(self, detections):
+        self.app.last_detections = detections
+        
+        if detections:
+            names = [d['display_name'] for d in detections[:2]]
+            text = "🔍 " + ", ".join(names)
+            if len(detections) > 2:
+                text += f" +{len(detections)-2}"
+            self.status_label.text = text
+            self.status_label.color = COLORS['success']
+        else:
+            self.status_label.text = "🔍 Поиск..."
+            self.status_label.color = COLORS['text_secondary']
 
 class OCRTab(BaseTab):
+    has_detector = False
+    
     def __init__(self, app, **kwargs):
         super().__init__(app, '📝 OCR', **kwargs)
         self.last_text = ""
         self.auto_speak = False
-        # Убираем self.reader
-        self._build_ui()
-    
-    def capture_and_recognize(self, instance):
-        # Вместо OCR просто показываем сообщение
-        self.result_label.text = "❌ OCR недоступен в этой сборке"
-        self.result_label.color = COLORS['error']
-        if self.auto_speak:
-            threading.Thread(target=self.app.tts.speak_text, args=("OCR не работает",), daemon=True).start()
     
-    # Остальные методы оставить как есть (update_frame и т.д.)
-
-class TemplateLoaderPopup(Popup):
-    def __init__(self, detector, callback, **kwargs):
-        super().__init__(**kwargs)
-        self.detector = detector
-        self.callback = callback
-        self.title = "📁 Загрузка шаблона"
-        self.size_hint = (0.9, 0.8)
-        
+    def _build_ui(self):
         layout = BoxLayout(orientation='vertical', padding=AppConfig.PADDING, spacing=AppConfig.SPACING)
         
-        title_label = ModernLabel(variant='header', text="Выберите тип:", 
-                                 halign='center', size_hint_y=None, height=dp(40))
-        layout.add_widget(title_label)
+        video_card = ModernCard(orientation='vertical', size_hint=(1, 0.5))
+        self.image_widget = Image(size_hint=(1, 1), keep_ratio=True, allow_stretch=True)
+        video_card.add_widget(self.image_widget)
+        layout.add_widget(video_card)
         
-        self.type_label = ModernLabel(variant='secondary', text="❌ Не выбран", 
-                                     halign='center', size_hint_y=None, height=dp(30))
-        layout.add_widget(self.type_label)
+        # Кнопки
+        btn_layout = BoxLayout(orientation='vertical', size_hint_y=None, height=dp(160), spacing=AppConfig.SPACING)
         
-        # Кнопки выбора
-        for obj_id, obj_template in ObjectDetector.OBJECT_TEMPLATES.items():
-            btn = StyledButton(text=obj_template.display_name, size_hint_y=None, height=dp(40))
-            btn.obj_id = obj_id
-            btn.bind(on_press=self.select_type)
-            layout.add_widget(btn)
+        self.camera_btn = StyledToggleButton(text='▶ Камера', size_hint_y=None, height=dp(44))
+        self.camera_btn.bind(on_press=self.toggle_camera)
         
-        # Файловый выбор
-        self.filechooser = FileChooserListView(
-            filters=[f'*{ext}' for ext in AppConfig.SUPPORTED_EXTENSIONS],
-            size_hint=(1, 0.4)
-        )
-        layout.add_widget(self.filechooser)
+        self.recognize_btn = StyledButton(text='📝 Распознать', color_type='success', size_hint_y=None, height=dp(44))
+        self.recognize_btn.bind(on_press=self.capture_and_recognize)
         
-        # Кнопки
-        btn_layout = BoxLayout(size_hint_y=None, height=dp(48), spacing=AppConfig.SPACING)
-        load_btn = StyledButton(text='✅ Загрузить', color_type='success', size_hint_x=0.5)
-        load_btn.bind(on_press=self.load_template)
-        cancel_btn = StyledButton(text='❌ Отмена', color_type='warning', size_hint_x=0.5)
-        cancel_btn.bind(on_press=self.dismiss)
-        btn_layout.add_widget(load_btn)
-        btn_layout.add_widget(cancel_btn)
+        self.auto_btn = StyledToggleButton(text='🎤 Авто', size_hint_y=None, height=dp(44))
+        self.auto_btn.bind(on_press=self.toggle_auto)
+        
+        btn_layout.add_widget(self.camera_btn)
+        btn_layout.add_widget(self.recognize_btn)
+        btn_layout.add_widget(self.auto_btn)
         layout.add_widget(btn_layout)
         
-        self.selected_object = None
+        # Результат
+        result_card = ModernCard(orientation='vertical', size_hint=(1, 0.3))
+        scroll = ScrollView()
+        self.result_label = ModernLabel(
+            variant='secondary',
+            text='📝 Наведите на текст',
+            halign='center',
+            valign='middle',
+            size_hint_y=None
+        )
+        self.result_label.bind(texture_size=lambda lbl, ts: setattr(lbl, 'height', ts[1]))
+        scroll.add_widget(self.result_label)
+        result_card.add_widget(scroll)
+        layout.add_widget(result_card)
+        
         self.content = layout
     
-    def select_type(self, instance):
-        self.selected_object = instance.obj_id
-        self.type_label.text = f"✅ {instance.text}"
-        self.type_label.color = COLORS['success']
-    
-    def load_template(self, instance):
-        if self.selected_object and self.filechooser.selection:
-            path = self.filechooser.selection[0]
-            if self.detector.load_template(self.selected_object, path):
-                self.callback()
-                self.dismiss()
+    def toggle_camera(self, instance):
+        if instance.state == 'down':
+            self.start_camera()
+            instance.text = '⏹ Стоп'
+        else:
+            self.stop_camera()
+            instance.text = '▶ Камера'
+    
+    def toggle_auto(self, instance):
+        self.auto_speak = instance.state == 'down'
+        instance.text = '🎤 Авто ВКЛ' if self.auto_speak else '🎤 Авто'
+    
+    def capture_and_recognize(self, instance):
+        # Вместо OCR просто показываем сообщение
+        self.result_label.text = "❌ OCR недоступен в этой сборке"
+        self.result_label.color = COLORS['error']
+        if self.auto_speak:
+            self.app.tts.speak_text("OCR не работает")
+
+# Детекторы и озвучка вместе с OpenCV, pyzbar и gTTS. Создаются в фоновом
+# потоке после первого кадра либо при первом обращении
+class VisionServices:
+    def __init__(self, tts_cache_dir=None):
+        with STARTUP.phase('import.vision'):
+            from detectors import BarcodeReader, CurrencyRecognizer, ObjectDetector
+            from preprocess import FrameCacheProvider
+        with STARTUP.phase('import.speech'):
+            from speech import TextToSpeech, PRIORITY_ALERT, PRIORITY_CURRENCY, PRIORITY_BARCODE
+        
+        with STARTUP.phase('services'):
+            self.tts = TextToSpeech(cache_dir=tts_cache_dir)
+            # Предупреждения об объектах важнее купюр, купюры важнее кодов
+            self.detector = ObjectDetector(tts_callback=partial(
+                self.tts.speak_text, priority=PRIORITY_ALERT, key='objects'))
+            self.barcode_reader = BarcodeReader(tts_callback=partial(
+                self.tts.speak_text, priority=PRIORITY_BARCODE, key='barcode'))
+            self.currency_recognizer = CurrencyRecognizer(tts_callback=partial(
+                self.tts.speak_text, priority=PRIORITY_CURRENCY, key='currency'))
+            self.frame_caches = FrameCacheProvider(MAX_FRAME_WIDTH, MAX_FRAME_HEIGHT)
 
 class CameraApp(TabbedPanel):
     def __init__(self, **kwargs):
@@ -998,76 +772,147 @@ class CameraApp(TabbedPanel):
         self.tab_height = dp(50)
         
         # Компоненты
-        self.tts = TextToSpeech()
-        self.detector = ObjectDetector(tts_callback=self.tts.speak_text)
-        self.barcode_reader = BarcodeReader(tts_callback=self.tts.speak_text)
-        self.currency_recognizer = CurrencyRecognizer(tts_callback=self.tts.speak_text)
+        app = App.get_running_app()
+        self._tts_cache_dir = os.path.join(app.user_data_dir, 'tts_cache') if app else None
+        # Пул создается до запуска потоков приложения: воркеры порождаются через fork
+        workers = pool_size_from_env(AppConfig.PROCESS_POOL_WORKERS)
+        self.detection_pool = create_pool(workers)
+        self.detection_worker = DetectionWorker()
+        self._services: Optional[VisionServices] = None
+        self._services_lock = threading.Lock()
         
         # Инициализация EasyOCR в фоне
         self.reader = None
         
         # Переменные
-        self.capture = None
-        self.test_mode = False
+        self.camera = None
+        self.recorder = None
         self.last_detections = []
-        self._frame_lock = threading.Lock()
-        self._last_frame = None
         
-        # Вкладки
+        # Вкладки: сразу строится только первая, видимая при запуске
         self.detection_tab = ObjectDetectionTab(self)
         self.ocr_tab = OCRTab(self)
         self.barcode_tab = BarcodeTab(self)
-        self.currency_tab = CurrencyTab(self)
+        # Без эталонов купюры не распознаются: вкладка появится, когда их соберут
+        self.reference_currencies = reference_currencies()
+        self.currency_tab = CurrencyTab(self) if self.reference_currencies else None
+        self.detection_tab.ensure_built()
         
         self.add_widget(self.detection_tab)
         self.add_widget(self.ocr_tab)
         self.add_widget(self.barcode_tab)
-        self.add_widget(self.currency_tab)
+        if self.currency_tab is not None:
+            self.add_widget(self.currency_tab)
         
-        # Инициализация
+        # Инициализация: камера в главном потоке, остальное в фоне
         Clock.schedule_once(lambda dt: self._init_camera(), 0)
-        Clock.schedule_once(lambda dt: self._init_templates(), 1)
         
         # Очистка памяти
         Clock.schedule_interval(lambda dt: gc.collect(), 30)
     
+    def switch_to(self, header, do_scroll=False):
+        if isinstance(header, BaseTab):
+            header.ensure_built()
+        super().switch_to(header, do_scroll=do_scroll)
+    
+    @property
+    def services(self) -> VisionServices:
+        # Первое обращение до окончания фоновой загрузки ждет ее на блокировке
+        if self._services is None:
+            with self._services_lock:
+                if self._services is None:
+                    self._services = VisionServices(self._tts_cache_dir)
+        return self._services
+    
+    @property
+    def tts(self):
+        return self.services.tts
+    
+    @property
+    def detector(self):
+        return self.services.detector
+    
+    @property
+    def barcode_reader(self):
+        return self.services.barcode_reader
+    
+    @property
+    def currency_recognizer(self):
+        return self.services.currency_recognizer
+    
+    @property
+    def frame_caches(self):
+        return self.services.frame_caches
     
     def _init_camera(self):
+        spec = os.environ.get('VISION_FRAME_SOURCE', AppConfig.FRAME_SOURCE)
+        speed = float(os.environ.get('VISION_REPLAY_SPEED', AppConfig.REPLAY_SPEED))
+        if spec:
+            camera = open_source(spec, speed=speed, loop=True)
+        elif platform == 'android':
+            camera = CameraCapture(AppConfig.CAMERA_ID, MAX_FRAME_WIDTH, MAX_FRAME_HEIGHT, 15)
+        else:
+            camera = CameraCapture(AppConfig.CAMERA_ID)
+        
+        record_dir = os.environ.get('VISION_RECORD_DIR', AppConfig.RECORD_DIR)
+        if record_dir:
+            self.recorder = FrameRecorder(record_dir)
+            camera.recorder = self.recorder
+        
+        with STARTUP.phase('camera.open'):
+            started = camera.start()
+        if not started:
+            # Без камеры — один заранее созданный пустой кадр
+            camera = BlankSource(MAX_FRAME_WIDTH, MAX_FRAME_HEIGHT)
+            camera.start()
+        self.camera = camera
+        threading.Thread(target=self._warm_up, name='warm-up', daemon=True).start()
+    
+    def _warm_up(self):
+        # Детекторы, шаблоны и озвучка известных фраз — в фоне, пока идет превью
         try:
-            self.capture = cv2.VideoCapture(AppConfig.CAMERA_ID)
-            if platform == 'android':
-                self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, MAX_FRAME_WIDTH)
-                self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, MAX_FRAME_HEIGHT)
-                self.capture.set(cv2.CAP_PROP_FPS, 15)
-            
-            if not self.capture or not self.capture.isOpened():
-                raise Exception()
-            self.test_mode = False
-        except:
-            self.test_mode = True
+            services = self.services
+            with STARTUP.phase('templates'):
+                loaded = services.detector.load_default_templates()
+            Clock.schedule_once(lambda dt: self._init_templates(loaded))
+            from detectors import known_phrases
+            services.tts.prewarm(known_phrases())
+        except Exception as e:
+            print(f"Startup Error: {e}")
+        print("Startup timing:")
+        for line in STARTUP.report_lines():
+            print(f"  {line}")
     
-    def _init_templates(self):
-        if self.detector.load_default_templates():
+    def _init_templates(self, loaded):
+        if loaded:
             self.detection_tab.info_label.text = "✅ Шаблоны загружены"
             self.detection_tab.info_label.color = COLORS['success']
         else:
             self.detection_tab.info_label.text = "📁 Загрузите шаблоны"
             self.detection_tab.info_label.color = COLORS['warning']
     
+    def get_current_packet(self):
+        if self.camera:
+            return self.camera.latest()
+        return None
+    
+    def take_packet(self):
+        if self.camera:
+            return self.camera.take()
+        return None
+    
     def get_current_frame(self):
-        if self.test_mode:
-            return np.zeros((MAX_FRAME_HEIGHT, MAX_FRAME_WIDTH, 3), dtype=np.uint8)
-        
-        if self.capture and self.capture.isOpened():
-            ret, frame = self.capture.read()
-            if ret:
-                with self._frame_lock:
-                    self._last_frame = frame
-                return frame
-        return self._last_frame
+        # Последний кадр источника, без ожидания и копирования
+        packet = self.get_current_packet()
+        return packet.frame if packet is not None else None
     
     @staticmethod
     def display_frame(frame, widget):
+        with PROFILER.span('upload'):
+            CameraApp._upload_frame(frame, widget)
+    
+    @staticmethod
+    def _upload_frame(frame, widget):
         try:
             if frame is None:
                 return
@@ -1075,18 +920,27 @@ class CameraApp(TabbedPanel):
             h, w = frame.shape[:2]
             if w > MAX_FRAME_WIDTH:
                 scale = MAX_FRAME_WIDTH / w
-                new_w = MAX_FRAME_WIDTH
-                new_h = int(h * scale)
-                frame = cv2.resize(frame, (new_w, new_h))
+                w, h = MAX_FRAME_WIDTH, int(h * scale)
+                import cv2
+                frame = cv2.resize(frame, (w, h))
             
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            texture = Texture.create(size=(rgb.shape[1], rgb.shape[0]), colorfmt='rgb')
-            texture.blit_buffer(cv2.flip(rgb, 0).tobytes(), colorfmt='rgb', bufferfmt='ubyte')
-            widget.texture = texture
+            # Одна текстура на виджет, пересоздается только при смене размера
+            texture = widget.texture
+            if texture is None or texture.size != (w, h) or texture.colorfmt != 'bgr':
+                texture = Texture.create(size=(w, h), colorfmt='bgr')
+                # Переворот через координаты текстуры вместо копирования пикселей
+                texture.flip_vertical()
+                widget.texture = texture
+            
+            # BGR из OpenCV загружается напрямую, без cvtColor и tobytes()
+            texture.blit_buffer(np.ascontiguousarray(frame).reshape(-1),
+                                colorfmt='bgr', bufferfmt='ubyte')
+            widget.canvas.ask_update()
         except:
             pass
     
     def show_template_loader(self, instance):
+        from template_loader import TemplateLoaderPopup
         TemplateLoaderPopup(self.detector, self._on_templates_loaded).open()
     
     def _on_templates_loaded(self):
@@ -1094,20 +948,47 @@ class CameraApp(TabbedPanel):
         self.detection_tab.info_label.text = f"✅ Загружено: {count}"
         self.detection_tab.info_label.color = COLORS['success']
     
+    def dump_profile(self, path=None):
+        if path is None:
+            app = App.get_running_app()
+            path = os.path.join(app.user_data_dir if app else '.', 'profile.json')
+        try:
+            PROFILER.dump(path)
+            print(f"Profile saved: {path}")
+        except OSError as e:
+            print(f"Profile Error: {e}")
+    
     def on_stop(self):
         self.detection_tab.stop_camera()
         self.ocr_tab.stop_camera()
         self.barcode_tab.stop_camera()
-        self.currency_tab.stop_camera()
-        if self.capture:
-            self.capture.release()
+        if self.currency_tab is not None:
+            self.currency_tab.stop_camera()
+        self.detection_worker.stop()
+        if self.detection_pool:
+            self.detection_pool.shutdown()
+        if self._services is not None:
+            self._services.tts.shutdown()
+        if PROFILER.enabled:
+            self.dump_profile()
+        if self.camera:
+            self.camera.stop()
+            self.camera = None
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
 
 class MainApp(App):
     def build(self):
         self.title = "Vision Assist"
         if platform == 'android':
             from android.config import ACTIVE_CLASS_NAME
-        return CameraApp()
+        with STARTUP.phase('build.app'):
+            return CameraApp()
+    
+    def on_stop(self):
+        if self.root:
+            self.root.on_stop()
 
 if __name__ == '__main__':
     print("🎯 Vision Assist для Android")
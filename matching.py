@@ -0,0 +1,231 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Масштабы шаблона относительно загруженного размера: знак ближе или дальше
+DEFAULT_SCALES = (0.6, 0.8, 1.0, 1.25, 1.6)
+# Самый грубый уровень пирамиды, на котором ищутся кандидаты
+COARSE_LEVEL = 2
+# Минимальная сторона шаблона на грубом уровне, иначе корреляция шумит
+MIN_COARSE_SIZE = 12
+# Насколько ниже порога допускаем кандидатов на грубом уровне
+COARSE_MARGIN = 0.15
+MAX_CANDIDATES = 8
+
+Box = Tuple[int, int, int, int, float]
+
+
+def find_peaks(response: np.ndarray, threshold: float, min_distance: int,
+               limit: int = MAX_CANDIDATES) -> List[Tuple[int, int, float]]:
+    # Локальные максимумы выше порога: точка равна максимуму в своей окрестности
+    size = 2 * max(1, min_distance) + 1
+    dilated = cv2.dilate(response, np.ones((size, size), np.uint8))
+    ys, xs = np.nonzero((response >= dilated) & (response >= threshold))
+    if len(xs) == 0:
+        return []
+    scores = response[ys, xs]
+    order = np.argsort(-scores)[:limit]
+    return [(int(xs[i]), int(ys[i]), float(scores[i])) for i in order]
+
+
+def non_max_suppression(boxes: Sequence[Box], iou_threshold: float = 0.3) -> List[Box]:
+    if not boxes:
+        return []
+    arr = np.array([b[:4] for b in boxes], dtype=np.float32)
+    scores = np.array([b[4] for b in boxes], dtype=np.float32)
+    x1, y1 = arr[:, 0], arr[:, 1]
+    x2, y2 = x1 + arr[:, 2], y1 + arr[:, 3]
+    areas = arr[:, 2] * arr[:, 3]
+    order = np.argsort(-scores)
+
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(boxes[i])
+        rest = order[1:]
+        w = np.maximum(0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        h = np.maximum(0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-6)
+        order = rest[iou <= iou_threshold]
+    return keep
+
+
+# Многомасштабный поиск шаблона по пирамиде изображения: кандидаты ищутся
+# на грубом уровне, а уточняются только в маленьких окнах полного разрешения
+class PyramidMatcher:
+    def __init__(self, template: np.ndarray, scales: Sequence[float] = DEFAULT_SCALES,
+                 coarse_level: int = COARSE_LEVEL):
+        self.coarse_level = coarse_level
+        self.variants = self.build_variants(template, scales, coarse_level)
+
+    @classmethod
+    def from_variants(cls, variants: Sequence[Sequence[np.ndarray]],
+                      coarse_level: int = COARSE_LEVEL) -> 'PyramidMatcher':
+        # Готовые уровни, например из скомпилированного хранилища шаблонов
+        matcher = cls.__new__(cls)
+        matcher.coarse_level = coarse_level
+        matcher.variants = [list(levels) for levels in variants]
+        return matcher
+
+    @classmethod
+    def build_variants(cls, template: np.ndarray, scales: Sequence[float] = DEFAULT_SCALES,
+                       coarse_level: int = COARSE_LEVEL) -> List[List[np.ndarray]]:
+        variants = []
+        for scale in scales:
+            h, w = template.shape[:2]
+            size = (max(1, int(w * scale)), max(1, int(h * scale)))
+            base = cv2.resize(template, size, interpolation=cv2.INTER_AREA)
+            variants.append(cls.build_levels(base, coarse_level))
+        return variants
+
+    @staticmethod
+    def build_levels(base: np.ndarray, coarse_level: int) -> List[np.ndarray]:
+        levels = [base]
+        while len(levels) <= coarse_level and min(levels[-1].shape[:2]) // 2 >= MIN_COARSE_SIZE:
+            levels.append(cv2.pyrDown(levels[-1]))
+        return levels
+
+    def match(self, pyramid: Sequence[np.ndarray], threshold: float) -> List[Box]:
+        image = pyramid[0]
+        boxes: List[Box] = []
+
+        for levels in self.variants:
+            tpl = levels[0]
+            th, tw = tpl.shape[:2]
+            if image.shape[0] < th or image.shape[1] < tw:
+                continue
+
+            level = min(len(levels), len(pyramid)) - 1
+            while level > 0 and (pyramid[level].shape[0] < levels[level].shape[0]
+                                 or pyramid[level].shape[1] < levels[level].shape[1]):
+                level -= 1
+
+            response = cv2.matchTemplate(pyramid[level], levels[level], cv2.TM_CCOEFF_NORMED)
+            if level == 0:
+                for x, y, score in find_peaks(response, threshold, min(tw, th) // 2):
+                    boxes.append((x, y, tw, th, score))
+                continue
+
+            factor = 2 ** level
+            coarse_th, coarse_tw = levels[level].shape[:2]
+            peaks = find_peaks(response, threshold - COARSE_MARGIN, min(coarse_tw, coarse_th) // 2)
+            for cx, cy, _ in peaks:
+                # Уточняем кандидата на полном разрешении в окне ±factor пикселей
+                x0 = max(0, cx * factor - factor)
+                y0 = max(0, cy * factor - factor)
+                x1 = min(image.shape[1], cx * factor + tw + factor)
+                y1 = min(image.shape[0], cy * factor + th + factor)
+                window = image[y0:y1, x0:x1]
+                if window.shape[0] < th or window.shape[1] < tw:
+                    continue
+                fine = cv2.matchTemplate(window, tpl, cv2.TM_CCOEFF_NORMED)
+                _, score, _, loc = cv2.minMaxLoc(fine)
+                if score >= threshold:
+                    boxes.append((x0 + loc[0], y0 + loc[1], tw, th, float(score)))
+
+        return non_max_suppression(boxes)
+
+
+FLANN_INDEX_LSH = 6
+ORB_FEATURES = 500
+# Шаблоны для дескрипторов держим крупнее: на 100px ORB почти не находит точек
+FEATURE_TEMPLATE_SIZE = 320
+RATIO_TEST = 0.75
+MIN_INLIERS = 10
+
+
+def create_orb(n_features: int = ORB_FEATURES):
+    return cv2.ORB_create(nfeatures=n_features)
+
+
+def template_features(orb, template: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    # Точки и дескрипторы шаблона; None, если точек слишком мало для гомографии
+    keypoints, descriptors = orb.detectAndCompute(template, None)
+    if descriptors is None or len(keypoints) < MIN_INLIERS:
+        return None
+    return np.float32([kp.pt for kp in keypoints]), descriptors
+
+
+# Индекс бинарных дескрипторов всех шаблонов. Дескрипторы кадра сравниваются
+# с индексом одним запросом LSH, поэтому стоимость растет сублинейно с числом шаблонов
+class FeatureIndex:
+    def __init__(self, n_features: int = ORB_FEATURES):
+        self.orb = create_orb(n_features)
+        self._entries: Dict[str, Tuple[np.ndarray, np.ndarray, Tuple[int, int]]] = {}
+        self._names: List[str] = []
+        self._matcher = None
+
+    def add(self, name: str, template: np.ndarray) -> bool:
+        features = template_features(self.orb, template)
+        if features is None:
+            return False
+        self.add_features(name, *features, template.shape[:2])
+        return True
+
+    def add_features(self, name: str, points: np.ndarray, descriptors: np.ndarray,
+                     shape: Tuple[int, int]):
+        self._entries[name] = (points, descriptors, shape)
+        # Индекс перестраивается лениво при следующем поиске
+        self._matcher = None
+
+    def remove(self, name: str):
+        if self._entries.pop(name, None) is not None:
+            self._matcher = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _build_matcher(self):
+        matcher = cv2.FlannBasedMatcher(
+            dict(algorithm=FLANN_INDEX_LSH, table_number=6, key_size=12, multi_probe_level=1),
+            dict(checks=32))
+        self._names = list(self._entries)
+        matcher.add([self._entries[name][1] for name in self._names])
+        matcher.train()
+        self._matcher = matcher
+
+    def detect(self, image: np.ndarray):
+        keypoints, descriptors = self.orb.detectAndCompute(image, None)
+        points = np.float32([kp.pt for kp in keypoints]) if keypoints else np.empty((0, 2), np.float32)
+        return points, descriptors
+
+    def match(self, points: np.ndarray, descriptors: Optional[np.ndarray]
+              ) -> List[Tuple[str, np.ndarray, float]]:
+        if descriptors is None or len(descriptors) < MIN_INLIERS or not self._entries:
+            return []
+        if self._matcher is None:
+            self._build_matcher()
+
+        # Тест отношения Лоу, совпадения группируются по шаблону (imgIdx)
+        grouped: Dict[int, List[Tuple[int, int]]] = {}
+        for pair in self._matcher.knnMatch(descriptors, k=2):
+            if not pair:
+                continue
+            best = pair[0]
+            if len(pair) > 1 and best.distance >= RATIO_TEST * pair[1].distance:
+                continue
+            grouped.setdefault(best.imgIdx, []).append((best.queryIdx, best.trainIdx))
+
+        results = []
+        for idx, pairs in grouped.items():
+            if len(pairs) < MIN_INLIERS:
+                continue
+            name = self._names[idx]
+            tpl_points, _, (th, tw) = self._entries[name]
+            src = tpl_points[[t for _, t in pairs]].reshape(-1, 1, 2)
+            dst = points[[q for q, _ in pairs]].reshape(-1, 1, 2)
+            homography, mask = cv2.findHomography(src, dst, cv2.RANSAC, 5.0)
+            if homography is None:
+                continue
+            inliers = int(mask.sum())
+            if inliers < MIN_INLIERS:
+                continue
+            corners = np.float32([[0, 0], [tw, 0], [tw, th], [0, th]]).reshape(-1, 1, 2)
+            projected = cv2.perspectiveTransform(corners, homography).reshape(-1, 2)
+            # Вырожденная гомография дает перекрученный или пустой четырехугольник
+            if not cv2.isContourConvex(projected) or cv2.contourArea(projected) < 100:
+                continue
+            results.append((name, projected, inliers / len(pairs)))
+        return results
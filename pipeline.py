@@ -0,0 +1,155 @@
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from capture import FramePacket
+
+
+class DetectionJob:
+    __slots__ = ('packet', 'detect', 'on_result')
+
+    def __init__(self, packet: FramePacket, detect: Callable, on_result: Callable):
+        self.packet = packet
+        self.detect = detect
+        self.on_result = on_result
+
+
+# Фоновый детектор с обратным давлением: ждет только самый свежий кадр,
+# пока воркер занят, новые кадры заменяют ожидающий, а не копятся в очереди
+class DetectionWorker:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending: Optional[DetectionJob] = None
+        self._busy = False
+        self._running = True
+        self._last_frame_id = 0
+        self.skipped_frames = 0
+        self.processed_frames = 0
+        self.last_latency = 0.0
+        self._thread = threading.Thread(target=self._run, name='detection-worker', daemon=True)
+        self._thread.start()
+
+    @property
+    def busy(self) -> bool:
+        return self._busy
+
+    def submit(self, packet: FramePacket, detect: Callable[[Any], Any],
+               on_result: Callable[[FramePacket, Any], None]) -> bool:
+        with self._cond:
+            if not self._running or packet.frame_id <= self._last_frame_id:
+                return False
+            if self._pending is not None:
+                self.skipped_frames += 1
+            self._pending = DetectionJob(packet, detect, on_result)
+            self._last_frame_id = packet.frame_id
+            self._cond.notify()
+        return True
+
+    def cancel(self):
+        with self._cond:
+            self._pending = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and self._pending is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                job = self._pending
+                self._pending = None
+                self._busy = True
+
+            start = time.perf_counter()
+            try:
+                result = job.detect(job.packet)
+            except Exception as e:
+                print(f"Detection Error: {e}")
+                result = None
+            self.last_latency = time.perf_counter() - start
+            self.processed_frames += 1
+            self._busy = False
+
+            if result is not None:
+                try:
+                    job.on_result(job.packet, result)
+                except Exception as e:
+                    print(f"Detection Error: {e}")
+
+    def stop(self, timeout: float = 1.0):
+        with self._cond:
+            self._running = False
+            self._pending = None
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+
+# Границы интервала запуска детектора вкладки, секунд
+MIN_FRAME_INTERVAL = 1 / 30
+MAX_FRAME_INTERVAL = 1 / 4
+# Интервал простоя, если долго ничего не находится
+IDLE_FRAME_INTERVAL = 0.5
+IDLE_AFTER = 5.0
+# Доля времени между тиками, которую разрешено тратить на обработку кадра
+PROCESSING_BUDGET = 0.6
+LATENCY_SMOOTHING = 0.2
+
+
+# Регулятор частоты запуска детектора вкладки: интервал подбирается так, чтобы
+# обработка (постановка кадра + детектор) занимала не больше бюджета времени.
+# Превью от него не зависит и обновляется с постоянной частотой
+class FrameRateGovernor:
+    def __init__(self, initial_interval: float = 1 / 15,
+                 min_interval: float = MIN_FRAME_INTERVAL,
+                 max_interval: float = MAX_FRAME_INTERVAL,
+                 idle_interval: float = IDLE_FRAME_INTERVAL,
+                 idle_after: float = IDLE_AFTER,
+                 budget: float = PROCESSING_BUDGET):
+        self.initial_interval = initial_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.idle_interval = idle_interval
+        self.idle_after = idle_after
+        self.budget = budget
+        self.reset()
+
+    def reset(self):
+        self.tick_latency = 0.0
+        self.detect_latency = 0.0
+        self.interval = self.initial_interval
+        self._last_hit = time.monotonic()
+
+    @staticmethod
+    def _smooth(previous: float, value: float) -> float:
+        return value if previous == 0.0 else previous + LATENCY_SMOOTHING * (value - previous)
+
+    def record_tick(self, seconds: float):
+        self.tick_latency = self._smooth(self.tick_latency, seconds)
+
+    def record_detection(self, seconds: float):
+        # Вызывается из потока детектора
+        self.detect_latency = self._smooth(self.detect_latency, seconds)
+
+    def observe(self, detections: int):
+        if detections:
+            self._last_hit = time.monotonic()
+
+    @property
+    def idle(self) -> bool:
+        return time.monotonic() - self._last_hit > self.idle_after
+
+    @property
+    def latency(self) -> float:
+        return self.tick_latency + self.detect_latency
+
+    @property
+    def rate(self) -> float:
+        return 1.0 / self.interval
+
+    def next_interval(self) -> float:
+        if self.idle:
+            self.interval = max(self.idle_interval, self.min_interval)
+        else:
+            target = self.latency / self.budget
+            self.interval = min(max(target, self.min_interval), self.max_interval)
+        return self.interval
@@ -0,0 +1,96 @@
+import threading
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from profiling import PROFILER
+
+
+# Общие производные представления одного кадра. Каждое считается лениво
+# и один раз, сколько бы детекторов ни работало с этим кадром.
+class FrameCache:
+    def __init__(self, frame: np.ndarray, frame_id: int = 0,
+                 max_width: int = 640, max_height: int = 480):
+        self.frame = frame
+        self.frame_id = frame_id
+        h, w = frame.shape[:2]
+        self.scale = min(max_width / w, max_height / h, 1.0)
+        self._views: Dict[str, np.ndarray] = {}
+        self._lock = threading.RLock()
+
+    def _get(self, key: str, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        view = self._views.get(key)
+        if view is None:
+            with self._lock:
+                view = self._views.get(key)
+                if view is None:
+                    with PROFILER.span('preprocess.' + key):
+                        view = compute()
+                    self._views[key] = view
+        return view
+
+    def derived(self, key: str, compute: Callable[[], object]):
+        # Произвольные производные данные кадра (например, ключевые точки)
+        return self._get(key, compute)
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self._get('gray', lambda: cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY))
+
+    @property
+    def small(self) -> np.ndarray:
+        return self._get('small', lambda: self._downscale(self.frame))
+
+    @property
+    def small_gray(self) -> np.ndarray:
+        def compute():
+            # Если полутон уже есть, дешевле уменьшить его, чем конвертировать цвет
+            if 'gray' in self._views:
+                return self._downscale(self._views['gray'])
+            return cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY)
+        return self._get('small_gray', compute)
+
+    def pyramid(self, levels: int) -> List[np.ndarray]:
+        # Уровень 0 — small_gray, каждый следующий вдвое меньше (pyrDown)
+        result = [self.small_gray]
+        for level in range(1, levels):
+            prev = result[-1]
+            if min(prev.shape[:2]) < 2:
+                break
+            result.append(self._get(f'pyr{level}', lambda p=prev: cv2.pyrDown(p)))
+        return result
+
+    def _downscale(self, image: np.ndarray) -> np.ndarray:
+        if self.scale >= 1.0:
+            return image
+        h, w = image.shape[:2]
+        return cv2.resize(image, (int(w * self.scale), int(h * self.scale)),
+                          interpolation=cv2.INTER_AREA)
+
+    def release(self):
+        with self._lock:
+            self._views.clear()
+
+
+# Держит кэш только текущего кадра: при приходе нового id старый освобождается
+class FrameCacheProvider:
+    def __init__(self, max_width: int, max_height: int):
+        self.max_width = max_width
+        self.max_height = max_height
+        self._lock = threading.Lock()
+        self._current: Optional[FrameCache] = None
+
+    def get(self, frame_id: int, frame: np.ndarray) -> FrameCache:
+        with self._lock:
+            current = self._current
+            if current is not None and current.frame_id == frame_id:
+                return current
+            if current is not None and frame_id < current.frame_id:
+                # Запоздавший кадр не должен вытеснять более новый
+                return FrameCache(frame, frame_id, self.max_width, self.max_height)
+            cache = FrameCache(frame, frame_id, self.max_width, self.max_height)
+            self._current = cache
+        if current is not None:
+            current.release()
+        return cache
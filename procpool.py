@@ -0,0 +1,222 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from capture import FramePacket
+from constants import IS_ANDROID
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+    SHARED_MEMORY_AVAILABLE = True
+except ImportError:
+    SHARED_MEMORY_AVAILABLE = False
+
+# Включение пула: VISION_PROCESS_POOL=1 (воркеров по числу ядер) или число воркеров
+POOL_ENV = 'VISION_PROCESS_POOL'
+# Слотов кольца больше, чем воркеров: пока воркеры заняты, следующий кадр уже копируется
+EXTRA_SLOTS = 1
+
+DETECT_BARCODES = 'barcodes'
+DETECT_CURRENCY = 'currency'
+DETECT_OBJECTS = 'objects'
+
+
+def pool_supported() -> bool:
+    # На Android процессы Python не порождаются, там только внутрипроцессный режим
+    return SHARED_MEMORY_AVAILABLE and not IS_ANDROID
+
+
+def default_pool_size() -> int:
+    # Одно ядро остается главному потоку Kivy
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def pool_size_from_env(default: int = 0) -> int:
+    # default: 0 — выключено, отрицательное — по числу ядер
+    value = os.environ.get(POOL_ENV, '').strip().lower()
+    if not value:
+        return default_pool_size() if default < 0 else default
+    if value in ('0', 'off', 'false', 'no'):
+        return 0
+    if value.isdigit() and int(value) > 1:
+        return int(value)
+    return default_pool_size()
+
+
+# Кольцо блоков разделяемой памяти: кадр копируется в свободный слот один раз,
+# воркер читает его по имени блока, пиксели не сериализуются
+class SharedFrameRing:
+    def __init__(self, slots: int):
+        self._blocks: List[Optional['shared_memory.SharedMemory']] = [None] * slots
+        self._free = list(range(slots))
+        self._lock = threading.Lock()
+
+    def acquire(self, frame: np.ndarray) -> Optional[Tuple[int, str]]:
+        with self._lock:
+            if not self._free:
+                return None
+            index = self._free.pop()
+        block = self._blocks[index]
+        if block is None or block.size < frame.nbytes:
+            # Слот растет под больший кадр; старый блок освобождается
+            if block is not None:
+                block.close()
+                block.unlink()
+            block = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+            self._blocks[index] = block
+        np.ndarray(frame.shape, frame.dtype, buffer=block.buf)[...] = frame
+        return index, block.name
+
+    def release(self, index: int):
+        with self._lock:
+            self._free.append(index)
+
+    def close(self):
+        for block in self._blocks:
+            if block is not None:
+                block.close()
+                block.unlink()
+        self._blocks = []
+
+
+# Состояние процесса-воркера: свои экземпляры детекторов без озвучки и голосования
+_detectors = None
+# Подключенные блоки по номеру слота кольца
+_attached: Dict[int, 'shared_memory.SharedMemory'] = {}
+_own_tracker = False
+
+
+def _init_worker(own_tracker: bool):
+    global _detectors, _own_tracker
+    _own_tracker = own_tracker
+    from detectors import BarcodeReader, CurrencyRecognizer, ObjectDetector
+    _detectors = {
+        DETECT_BARCODES: BarcodeReader(),
+        DETECT_CURRENCY: CurrencyRecognizer(),
+        DETECT_OBJECTS: ObjectDetector(),
+    }
+
+
+def _attach(slot: int, name: str) -> 'shared_memory.SharedMemory':
+    block = _attached.get(slot)
+    if block is not None and block.name != name:
+        # Родитель заменил блок слота большим и удалил старый: без close его
+        # отображение осталось бы в воркере до конца процесса
+        try:
+            block.close()
+        except BufferError:
+            pass
+        block = None
+    if block is None:
+        block = shared_memory.SharedMemory(name=name)
+        if _own_tracker:
+            # Блоком владеет родитель: свой трекер ресурсов воркера не должен его удалять
+            try:
+                resource_tracker.unregister(block._name, 'shared_memory')
+            except Exception:
+                pass
+        _attached[slot] = block
+    return block
+
+
+def _run_task(kind: str, slot: int, block_name: str, shape: Tuple[int, ...], dtype: str,
+              params: Dict) -> List[Dict]:
+    from detectors import MAX_FRAME_HEIGHT, MAX_FRAME_WIDTH
+    from preprocess import FrameCache
+
+    block = _attach(slot, block_name)
+    frame = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+    cache = FrameCache(frame, max_width=MAX_FRAME_WIDTH, max_height=MAX_FRAME_HEIGHT)
+    try:
+        detector = _detectors[kind]
+        if kind == DETECT_BARCODES:
+            return detector.decode_barcodes(frame, cache, remember=False)
+        if kind == DETECT_CURRENCY:
+            detector.set_currency(params.get('currency', 'rub'))
+            return detector.recognize_currency(frame, cache, vote=False)
+        if kind == DETECT_OBJECTS:
+            # Шаблоны догружаются, если родитель загрузил новые
+            for name, path in params.get('templates', {}).items():
+                if detector.template_paths.get(name) != path:
+                    detector.load_template(name, path)
+            return detector.detect_objects(frame, cache, announce=False)
+        raise ValueError(f"Unknown detector: {kind}")
+    finally:
+        # Представления кадра ссылаются на разделяемый блок — освобождаем до возврата
+        cache.release()
+        del frame
+
+
+# Пул процессов-детекторов. Кадры конвейеризуются: в работе одновременно
+# до одного кадра на воркер, результаты старше уже выданных отбрасываются
+class DetectorPool:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.ring = SharedFrameRing(workers + EXTRA_SLOTS)
+        methods = multiprocessing.get_all_start_methods()
+        # fork не переимпортирует главный модуль с Kivy; пул создается до старта
+        # остальных потоков приложения
+        method = 'fork' if 'fork' in methods else 'spawn'
+        self._executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(method),
+                                             initializer=_init_worker,
+                                             initargs=(method != 'fork',))
+        self._lock = threading.Lock()
+        self._last_delivered = 0
+        self.skipped_frames = 0
+        # Воркеры поднимаются сразу, а не при первом кадре
+        for _ in range(workers):
+            self._executor.submit(time.sleep, 0)
+
+    def submit(self, packet: FramePacket, kind: str, params: Dict,
+               on_result: Callable[[FramePacket, List[Dict], float], None]) -> bool:
+        # on_result получает задержку именно этого кадра: в работе их несколько
+        slot = self.ring.acquire(packet.frame)
+        if slot is None:
+            # Все слоты в работе — кадр пропускается, очередь не растет
+            self.skipped_frames += 1
+            return False
+        index, block_name = slot
+        start = time.perf_counter()
+        try:
+            future = self._executor.submit(_run_task, kind, index, block_name, packet.frame.shape,
+                                           packet.frame.dtype.str, params)
+        except RuntimeError:
+            self.ring.release(index)
+            return False
+
+        def done(future: Future):
+            self.ring.release(index)
+            latency = time.perf_counter() - start
+            try:
+                detections = future.result()
+            except Exception as e:
+                print(f"Detection Error: {e}")
+                return
+            with self._lock:
+                if packet.frame_id <= self._last_delivered:
+                    self.skipped_frames += 1
+                    return
+                self._last_delivered = packet.frame_id
+            on_result(packet, detections, latency)
+
+        future.add_done_callback(done)
+        return True
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        self.ring.close()
+
+
+def create_pool(workers: int) -> Optional[DetectorPool]:
+    if workers <= 0 or not pool_supported():
+        return None
+    try:
+        return DetectorPool(workers)
+    except Exception as e:
+        print(f"Process pool Error: {e}")
+        return None
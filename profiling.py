@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+# Включение замеров: VISION_PROFILE=1
+PROFILE_ENV = 'VISION_PROFILE'
+# Сколько последних замеров хранится на каждый этап
+SPAN_BUFFER = 256
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('stats', 'start')
+
+    def __init__(self, stats: 'StageStats'):
+        self.stats = stats
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.record(time.perf_counter() - self.start)
+        return False
+
+
+# Кольцевой буфер длительностей одного этапа фиксированного размера
+class StageStats:
+    def __init__(self, size: int = SPAN_BUFFER):
+        self.size = size
+        self.count = 0
+        self._durations = [0.0] * size
+        self._stamps = [0.0] * size
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            index = self.count % self.size
+            self._durations[index] = seconds
+            self._stamps[index] = time.monotonic()
+            self.count += 1
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            n = min(self.count, self.size)
+            durations = sorted(self._durations[:n])
+            stamps = self._stamps[:n]
+        if not n:
+            return {'count': 0}
+
+        def percentile(p: float) -> float:
+            return durations[min(n - 1, int(p * n))] * 1000
+
+        elapsed = max(stamps) - min(stamps)
+        return {
+            'count': self.count,
+            'mean_ms': sum(durations) / n * 1000,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'fps': (n - 1) / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+# Именованные замеры этапов. Выключенный профайлер отдает общий пустой
+# контекст, поэтому стоимость замера — одна проверка флага
+class Profiler:
+    def __init__(self, enabled: bool = False, size: int = SPAN_BUFFER):
+        self.enabled = enabled
+        self.size = size
+        self._stages: Dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+
+    def _stage(self, name: str) -> StageStats:
+        stats = self._stages.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self._stages.setdefault(name, StageStats(self.size))
+        return stats
+
+    def span(self, name: str):
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self._stage(name))
+
+    def record(self, name: str, seconds: float):
+        if self.enabled:
+            self._stage(name).record(seconds)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        # Потоки детекторов добавляют этапы на лету — перебираем копию
+        with self._lock:
+            stages = sorted(self._stages.items())
+        return {name: stats.summary() for name, stats in stages}
+
+    def report_lines(self) -> List[str]:
+        # Строки для HUD: p50/p95/p99 и частота по каждому этапу
+        lines = []
+        for name, summary in self.stats().items():
+            if not summary['count']:
+                continue
+            lines.append(f"{name}: {summary['p50_ms']:.1f}/{summary['p95_ms']:.1f}/"
+                         f"{summary['p99_ms']:.1f} ms  {summary['fps']:.1f} fps")
+        return lines
+
+    def dump(self, path: str):
+        data = {'timestamp': time.time(), 'buffer': self.size, 'stages': self.stats()}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+
+PROFILER = Profiler(enabled=os.environ.get(PROFILE_ENV, '') not in ('', '0'))
+
+
+# Отчет о холодном старте: длительность фаз (импорт, построение виджетов,
+# открытие камеры) и время от запуска процесса до каждой отметки
+class StartupReport:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.phases: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self.phases.append((name, seconds, time.perf_counter() - self.origin))
+
+    def phase(self, name: str):
+        return _Phase(self, name)
+
+    def report_lines(self) -> List[str]:
+        with self._lock:
+            phases = list(self.phases)
+        return [f"{name:<20} {seconds * 1000:8.1f} ms   at {at:6.2f} s"
+                for name, seconds, at in phases]
+
+
+class _Phase:
+    __slots__ = ('report', 'name', 'start')
+
+    def __init__(self, report: StartupReport, name: str):
+        self.report = report
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.report.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+STARTUP = StartupReport()
@@ -0,0 +1,312 @@
+import hashlib
+import heapq
+import itertools
+import os
+import tempfile
+import threading
+import time
+from typing import Iterable, List, Optional, Sequence
+
+from profiling import PROFILER
+from tts_backends import BackendSelector, SpeechBackend, default_backends, IS_ANDROID
+
+# Воспроизведение на Android через MediaPlayer с колбэком завершения
+try:
+    from jnius import autoclass, PythonJavaClass, java_method
+    MediaPlayer = autoclass('android.media.MediaPlayer')
+    ANDROID_MEDIA = True
+except Exception:
+    ANDROID_MEDIA = False
+
+try:
+    from playsound import playsound
+    PLAYSOUND_AVAILABLE = True
+except ImportError:
+    PLAYSOUND_AVAILABLE = False
+
+# Бюджет дискового кэша озвучки
+TTS_CACHE_BUDGET = 20 * 1024 * 1024
+
+# Приоритеты сообщений: меньше — важнее
+PRIORITY_ALERT = 0
+PRIORITY_CURRENCY = 1
+PRIORITY_BARCODE = 2
+SPEECH_QUEUE_SIZE = 8
+# Сообщение, не озвученное за это время, уже неактуально
+SPEECH_TTL = 4.0
+# Страховка на случай, если колбэк завершения не придет
+MAX_PLAYBACK_TIME = 30.0
+
+
+class SpeechRequest:
+    __slots__ = ('priority', 'seq', 'text', 'lang', 'key', 'expires')
+
+    def __init__(self, priority: int, seq: int, text: str, lang: str,
+                 key: Optional[str], expires: float):
+        self.priority = priority
+        self.seq = seq
+        self.text = text
+        self.lang = lang
+        self.key = key
+        self.expires = expires
+
+    def __lt__(self, other: 'SpeechRequest') -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+# Ограниченная очередь с приоритетами: одинаковые фразы и сообщения
+# с тем же ключом схлопываются, устаревшие выбрасываются при выдаче
+class SpeechQueue:
+    def __init__(self, maxsize: int = SPEECH_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self._heap: List[SpeechRequest] = []
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._closed = False
+
+    def put(self, text: str, lang: str, priority: int, key: Optional[str] = None,
+            ttl: float = SPEECH_TTL) -> bool:
+        with self._cond:
+            if self._closed:
+                return False
+            # Новое сообщение того же канала заменяет ожидающее
+            self._heap = [r for r in self._heap
+                          if r.text != text and (key is None or r.key != key)]
+            if len(self._heap) >= self.maxsize:
+                worst = max(self._heap)
+                if priority >= worst.priority:
+                    heapq.heapify(self._heap)
+                    return False
+                self._heap.remove(worst)
+            heapq.heapify(self._heap)
+            request = SpeechRequest(priority, next(self._seq), text, lang, key,
+                                    time.monotonic() + ttl)
+            heapq.heappush(self._heap, request)
+            self._cond.notify()
+            return True
+
+    def get(self) -> Optional[SpeechRequest]:
+        with self._cond:
+            while True:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return None
+                request = heapq.heappop(self._heap)
+                if request.expires >= time.monotonic():
+                    return request
+
+    def clear(self):
+        with self._cond:
+            self._heap = []
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._heap = []
+            self._cond.notify_all()
+
+
+if ANDROID_MEDIA:
+    class _CompletionListener(PythonJavaClass):
+        __javainterfaces__ = ['android/media/MediaPlayer$OnCompletionListener']
+        __javacontext__ = 'app'
+
+        def __init__(self, callback):
+            super().__init__()
+            self.callback = callback
+
+        @java_method('(Landroid/media/MediaPlayer;)V')
+        def onCompletion(self, player):
+            self.callback()
+
+
+# Кэш синтезированных фраз с адресацией по содержимому: ключ — (текст, язык, движок).
+# Время изменения файла служит отметкой последнего доступа для вытеснения LRU
+class AudioCache:
+    def __init__(self, directory: str, budget_bytes: int = TTS_CACHE_BUDGET):
+        self.directory = directory
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(text: str, lang: str, engine: str) -> str:
+        return hashlib.sha1(f"{engine}\0{lang}\0{text}".encode('utf-8')).hexdigest()
+
+    def path_for(self, text: str, lang: str, engine: str, ext: str = '.mp3') -> str:
+        return os.path.join(self.directory, self.key(text, lang, engine) + ext)
+
+    def get(self, text: str, lang: str, engine: str, ext: str = '.mp3') -> Optional[str]:
+        path = self.path_for(text, lang, engine, ext)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def temp_path(self, ext: str = '.mp3') -> str:
+        # Временный файл в той же папке, чтобы os.replace был атомарным
+        fd, path = tempfile.mkstemp(suffix=ext + '.part', dir=self.directory)
+        os.close(fd)
+        return path
+
+    def put(self, temp_path: str, text: str, lang: str, engine: str, ext: str = '.mp3') -> str:
+        path = self.path_for(text, lang, engine, ext)
+        os.replace(temp_path, path)
+        self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: Optional[str] = None):
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.directory):
+                if name.endswith('.part'):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.budget_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.unlink(path)
+                    total -= size
+                except OSError:
+                    pass
+
+
+# Один долгоживущий поток озвучки, питаемый очередью с приоритетами
+class TextToSpeech:
+    def __init__(self, cache_dir: Optional[str] = None,
+                 backends: Optional[Sequence[SpeechBackend]] = None):
+        if cache_dir is None:
+            cache_dir = os.path.join(tempfile.gettempdir(), 'visionassist_tts')
+        self.cache = AudioCache(cache_dir)
+        self.selector = BackendSelector(default_backends() if backends is None else backends)
+        self._queue = SpeechQueue()
+        self._player = None
+        self._playing: Optional[SpeechRequest] = None
+        self._done = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    def synthesize(self, text: str, lang: str = 'ru') -> str:
+        backends = self.selector.ranked(text)
+        # Попадание в кэш — файл готов сразу, без синтеза
+        for backend in backends:
+            path = self.cache.get(text, lang, backend.name, backend.ext)
+            if path:
+                return path
+
+        # Движки по порядку: при ошибке (например, нет сети) пробуем следующий
+        error = None
+        for backend in backends:
+            temp_path = self.cache.temp_path(backend.ext)
+            start = time.perf_counter()
+            try:
+                with PROFILER.span('tts'):
+                    backend.synthesize_to_file(text, lang, temp_path)
+            except Exception as e:
+                error = e
+                self.selector.record_failure(backend)
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+                continue
+            self.selector.record(backend, time.perf_counter() - start)
+            return self.cache.put(temp_path, text, lang, backend.name, backend.ext)
+        raise error or RuntimeError('No TTS backend available')
+
+    def prewarm(self, phrases: Iterable[str], lang: str = 'ru'):
+        # Фоновый синтез известных фраз, чтобы первое озвучивание было мгновенным
+        def run():
+            for text in phrases:
+                try:
+                    self.synthesize(text, lang)
+                except Exception as e:
+                    print(f"TTS Prewarm Error: {e}")
+                    return
+        thread = threading.Thread(target=run, name='tts-prewarm', daemon=True)
+        thread.start()
+        return thread
+
+    def speak_text(self, text: str, lang: str = 'ru', priority: int = PRIORITY_BARCODE,
+                   key: Optional[str] = None, ttl: float = SPEECH_TTL):
+        # Не блокирует: сообщение ставится в очередь единственного потока озвучки
+        if not text:
+            return
+        self._ensure_worker()
+        if self._queue.put(text, lang, priority, key, ttl):
+            playing = self._playing
+            # Более важное сообщение прерывает текущее воспроизведение
+            if playing is not None and priority < playing.priority:
+                self._stop_playback()
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='tts-worker', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            try:
+                audio_file = self.synthesize(request.text, request.lang)
+                # Пока шел синтез, сообщение могло устареть
+                if request.expires < time.monotonic():
+                    continue
+                self._playing = request
+                self._play(audio_file)
+            except Exception as e:
+                print(f"TTS Error: {e}")
+            finally:
+                self._playing = None
+
+    def _play(self, audio_file: str):
+        if ANDROID_MEDIA and IS_ANDROID:
+            self._done.clear()
+            player = MediaPlayer()
+            listener = _CompletionListener(self._done.set)
+            try:
+                player.setDataSource(audio_file)
+                player.setOnCompletionListener(listener)
+                player.prepare()
+                self._player = player
+                player.start()
+                # Ждем колбэк завершения от MediaPlayer вместо подбора sleep
+                self._done.wait(MAX_PLAYBACK_TIME)
+            finally:
+                self._player = None
+                player.release()
+        elif PLAYSOUND_AVAILABLE:
+            playsound(audio_file)
+
+    def _stop_playback(self):
+        player = self._player
+        if player is not None:
+            try:
+                player.stop()
+            except Exception:
+                pass
+        self._done.set()
+
+    def stop_speaking(self):
+        self._queue.clear()
+        self._stop_playback()
+
+    def shutdown(self):
+        self._queue.close()
+        self._stop_playback()
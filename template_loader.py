@@ -0,0 +1,67 @@
+from kivy.metrics import dp
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.filechooser import FileChooserListView
+from kivy.uix.popup import Popup
+
+from detectors import ObjectDetector
+from ui import AppConfig, COLORS, ModernLabel, StyledButton
+
+# Окно загрузки шаблона импортируется только при первом открытии:
+# файловый диалог Kivy заметно замедляет холодный старт
+
+class TemplateLoaderPopup(Popup):
+    def __init__(self, detector, callback, **kwargs):
+        super().__init__(**kwargs)
+        self.detector = detector
+        self.callback = callback
+        self.title = "📁 Загрузка шаблона"
+        self.size_hint = (0.9, 0.8)
+        
+        layout = BoxLayout(orientation='vertical', padding=AppConfig.PADDING, spacing=AppConfig.SPACING)
+        
+        title_label = ModernLabel(variant='header', text="Выберите тип:", 
+                                 halign='center', size_hint_y=None, height=dp(40))
+        layout.add_widget(title_label)
+        
+        self.type_label = ModernLabel(variant='secondary', text="❌ Не выбран", 
+                                     halign='center', size_hint_y=None, height=dp(30))
+        layout.add_widget(self.type_label)
+        
+        # Кнопки выбора
+        for obj_id, obj_template in ObjectDetector.OBJECT_TEMPLATES.items():
+            btn = StyledButton(text=obj_template.display_name, size_hint_y=None, height=dp(40))
+            btn.obj_id = obj_id
+            btn.bind(on_press=self.select_type)
+            layout.add_widget(btn)
+        
+        # Файловый выбор
+        self.filechooser = FileChooserListView(
+            filters=[f'*{ext}' for ext in AppConfig.SUPPORTED_EXTENSIONS],
+            size_hint=(1, 0.4)
+        )
+        layout.add_widget(self.filechooser)
+        
+        # Кнопки
+        btn_layout = BoxLayout(size_hint_y=None, height=dp(48), spacing=AppConfig.SPACING)
+        load_btn = StyledButton(text='✅ Загрузить', color_type='success', size_hint_x=0.5)
+        load_btn.bind(on_press=self.load_template)
+        cancel_btn = StyledButton(text='❌ Отмена', color_type='warning', size_hint_x=0.5)
+        cancel_btn.bind(on_press=self.dismiss)
+        btn_layout.add_widget(load_btn)
+        btn_layout.add_widget(cancel_btn)
+        layout.add_widget(btn_layout)
+        
+        self.selected_object = None
+        self.content = layout
+    
+    def select_type(self, instance):
+        self.selected_object = instance.obj_id
+        self.type_label.text = f"✅ {instance.text}"
+        self.type_label.color = COLORS['success']
+    
+    def load_template(self, instance):
+        if self.selected_object and self.filechooser.selection:
+            path = self.filechooser.selection[0]
+            if self.detector.load_template(self.selected_object, path):
+                self.callback()
+                self.dismiss()
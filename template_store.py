@@ -0,0 +1,319 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from matching import (PyramidMatcher, create_orb, template_features, COARSE_LEVEL, DEFAULT_SCALES,
+                      FEATURE_TEMPLATE_SIZE, MIN_COARSE_SIZE, ORB_FEATURES)
+
+# Скомпилированные шаблоны лежат рядом с исходными: templates/.compiled
+STORE_DIRNAME = '.compiled'
+MANIFEST_NAME = 'manifest.json'
+# Все массивы набора лежат в одном файле-пакете templates-<поколение>.pack
+PACK_PREFIX = 'templates-'
+PACK_SUFFIX = '.pack'
+PACK_ALIGN = 64
+# Пакет не переписывается ради нескольких килобайт мертвых данных
+PACK_SLACK = 1 << 16
+STORE_VERSION = 2
+# Наибольшая сторона шаблона для корреляции
+MATCH_TEMPLATE_SIZE = 100
+
+# Параметры, от которых зависит содержимое хранилища: при их смене оно пересобирается
+STORE_PARAMS = {
+    'version': STORE_VERSION,
+    'scales': list(DEFAULT_SCALES),
+    'coarse_level': COARSE_LEVEL,
+    'min_coarse_size': MIN_COARSE_SIZE,
+    'match_size': MATCH_TEMPLATE_SIZE,
+    'feature_size': FEATURE_TEMPLATE_SIZE,
+    'orb_features': ORB_FEATURES,
+}
+
+
+# Шаблон, готовый к поиску: уменьшенное полутоновое изображение и либо уровни
+# пирамиды по масштабам ('pixels'), либо точки и ORB-дескрипторы ('features')
+@dataclass
+class CompiledTemplate:
+    method: str
+    template: np.ndarray
+    variants: Optional[List[List[np.ndarray]]] = None
+    points: Optional[np.ndarray] = None
+    descriptors: Optional[np.ndarray] = None
+
+
+def store_directory(templates_dir: str) -> str:
+    return os.path.join(templates_dir, STORE_DIRNAME)
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compile_template(image_path: str, method: str) -> Optional[CompiledTemplate]:
+    template = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if template is None:
+        return None
+    if method == 'features':
+        if max(template.shape[:2]) > FEATURE_TEMPLATE_SIZE:
+            scale = FEATURE_TEMPLATE_SIZE / max(template.shape[:2])
+            template = cv2.resize(template, None, fx=scale, fy=scale,
+                                  interpolation=cv2.INTER_AREA)
+        features = template_features(create_orb(), template)
+        if features is None:
+            return None
+        points, descriptors = features
+        return CompiledTemplate(method, template, points=points, descriptors=descriptors)
+
+    # Уменьшаем размер шаблона для скорости
+    if template.shape[0] > MATCH_TEMPLATE_SIZE or template.shape[1] > MATCH_TEMPLATE_SIZE:
+        scale = min(MATCH_TEMPLATE_SIZE / template.shape[0], MATCH_TEMPLATE_SIZE / template.shape[1])
+        new_w = int(template.shape[1] * scale)
+        new_h = int(template.shape[0] * scale)
+        template = cv2.resize(template, (new_w, new_h))
+    return CompiledTemplate(method, template, variants=PyramidMatcher.build_variants(template))
+
+
+# Хранилище скомпилированных шаблонов одного набора: все массивы лежат подряд
+# в одном файле-пакете, который отображается через mmap один раз, а manifest.json
+# хранит для каждого исходного файла хэш и смещения его массивов в пакете.
+# Пакет только дописывается (старые байты не меняются), поэтому воркеры могут
+# читать хранилище, пока главный процесс добавляет новые шаблоны
+class TemplateStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self._entries: Dict[str, Dict] = {}
+        self._pack: Optional[str] = None
+        self._generation = 0
+        self._manifest_stamp = None
+        self._mapped = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        # Манифест перечитывается, только если его переписал другой процесс
+        try:
+            stamp = os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            self._entries, self._pack, self._manifest_stamp = {}, None, None
+            return
+        if stamp == self._manifest_stamp:
+            return
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        # Хранилище другой версии или с другими параметрами пересобирается целиком
+        if data.get('params') == STORE_PARAMS:
+            self._entries, self._pack = data.get('entries', {}), data.get('pack')
+        else:
+            self._entries, self._pack = {}, None
+        self._generation = data.get('generation', self._generation)
+        self._manifest_stamp = stamp
+
+    def _write_manifest(self):
+        data = {'params': STORE_PARAMS, 'pack': self._pack, 'generation': self._generation,
+                'entries': self._entries}
+        fd, temp_path = tempfile.mkstemp(suffix='.part', dir=self.directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+            f.write('\n')
+        os.replace(temp_path, self.manifest_path)
+        self._manifest_stamp = os.stat(self.manifest_path).st_mtime_ns
+
+    def _pack_path(self, pack: str) -> str:
+        return os.path.join(self.directory, pack)
+
+    def _new_pack(self) -> str:
+        self._generation += 1
+        return f"{PACK_PREFIX}{self._generation}{PACK_SUFFIX}"
+
+    def _remove_stale_files(self, keep: str):
+        # Пакеты прошлых поколений и .npy старого формата хранилища
+        for filename in os.listdir(self.directory):
+            if filename != keep and filename.endswith((PACK_SUFFIX, '.npy')):
+                try:
+                    os.unlink(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+
+    def _mapping(self, end: int) -> np.ndarray:
+        # Пакет отображается заново, только если он сменился или вырос после отображения
+        if self._mapped is None or self._mapped[0] != self._pack or len(self._mapped[1]) < end:
+            self._mapped = (self._pack, np.memmap(self._pack_path(self._pack), dtype=np.uint8, mode='r'))
+        return self._mapped[1]
+
+    def _validate(self, entry: Dict, source: str) -> bool:
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return False
+        if stat.st_size == entry.get('size') and stat.st_mtime_ns == entry.get('mtime_ns'):
+            return True
+        # Время изменения поменялось (копирование, распаковка) — сверяем содержимое
+        if stat.st_size != entry.get('size') or file_digest(source) != entry.get('sha1'):
+            return False
+        entry['mtime_ns'] = stat.st_mtime_ns
+        try:
+            self._write_manifest()
+        except OSError:
+            pass
+        return True
+
+    def load(self, source: str, method: str) -> Optional[CompiledTemplate]:
+        source = os.path.abspath(source)
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(source)
+            if entry is None or entry.get('method') != method or self._pack is None:
+                return None
+            if not self._validate(entry, source):
+                return None
+            try:
+                # Массивы — представления поверх отображения пакета: страницы
+                # подгружаются при первом обращении, ничего не копируется
+                packed = self._mapping(entry['end'])
+                arrays = {key: pack_view(packed, spec) for key, spec in entry['arrays'].items()}
+                variants = [[pack_view(packed, spec) for spec in levels]
+                            for levels in entry.get('variants', [])]
+                template = arrays['template']
+            except (OSError, ValueError, KeyError, TypeError):
+                return None
+        return CompiledTemplate(method, template, variants or None,
+                                arrays.get('points'), arrays.get('descriptors'))
+
+    def put(self, source: str, compiled: CompiledTemplate) -> bool:
+        # Дописывает массивы одного шаблона в конец пакета; записи других
+        # исходных файлов (в том числе с тем же именем объекта) не трогаются
+        source = os.path.abspath(source)
+        try:
+            stat = os.stat(source)
+            digest = file_digest(source)
+            with self._lock:
+                os.makedirs(self.directory, exist_ok=True)
+                self._refresh()
+                if self._pack is None or not os.path.exists(self._pack_path(self._pack)):
+                    self._entries, self._pack = {}, self._new_pack()
+                    open(self._pack_path(self._pack), 'wb').close()
+                    self._remove_stale_files(keep=self._pack)
+                arrays = {'template': compiled.template}
+                for key in ('points', 'descriptors'):
+                    if getattr(compiled, key) is not None:
+                        arrays[key] = getattr(compiled, key)
+                entry = {'sha1': digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                         'method': compiled.method, 'arrays': arrays,
+                         'variants': compiled.variants or []}
+                with open(self._pack_path(self._pack), 'ab') as f:
+                    self._entries[source] = map_arrays(entry, lambda array: pack_write(f, array))
+                self._compact()
+                self._write_manifest()
+            return True
+        except OSError as e:
+            # Хранилище только ускоряет запуск: без записи шаблон работает из памяти
+            print(f"Template store Error: {e}")
+            return False
+
+    def _compact(self):
+        # Замененные и удаленные записи оставляют в пакете мертвые байты; когда
+        # их больше, чем живых, живые массивы переписываются в новый пакет
+        size = os.path.getsize(self._pack_path(self._pack))
+        live = sum(entry_bytes(entry) for entry in self._entries.values())
+        if size <= 2 * live + PACK_SLACK:
+            return
+        packed = self._mapping(size)
+        previous, self._pack = self._pack, self._new_pack()
+        with open(self._pack_path(self._pack), 'wb') as f:
+            self._entries = {
+                source: map_arrays(entry, lambda spec: pack_write(f, pack_view(packed, spec)))
+                for source, entry in self._entries.items()}
+        self._mapped = None
+        # Воркер, уже отобразивший старый пакет, дочитает его: файл удаляется
+        # только из каталога, а новый манифест направит его к новому пакету
+        self._write_manifest()
+        try:
+            os.unlink(self._pack_path(previous))
+        except OSError:
+            pass
+
+    def prune(self) -> int:
+        # Удаляет записи, исходные файлы которых пропали
+        with self._lock:
+            self._refresh()
+            stale = [source for source in self._entries if not os.path.exists(source)]
+            if not stale:
+                return 0
+            for source in stale:
+                del self._entries[source]
+            try:
+                self._compact()
+                self._write_manifest()
+            except OSError as e:
+                print(f"Template store Error: {e}")
+            return len(stale)
+
+    def sources(self) -> List[str]:
+        with self._lock:
+            self._refresh()
+            return sorted(self._entries)
+
+
+def pack_write(f, array: np.ndarray) -> List:
+    # Массив пишется с выравниванием; в манифест попадают смещение, тип и форма
+    array = np.ascontiguousarray(array)
+    offset = f.tell()
+    padding = -offset % PACK_ALIGN
+    if padding:
+        f.write(b'\0' * padding)
+        offset += padding
+    f.write(array.tobytes())
+    return [offset, array.dtype.str, list(array.shape)]
+
+
+def pack_view(packed: np.ndarray, spec: List) -> np.ndarray:
+    offset, dtype, shape = spec
+    return np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=packed, offset=offset)
+
+
+def map_arrays(entry: Dict, convert) -> Dict:
+    # Применяет convert ко всем массивам записи (запись/перенос в пакет)
+    entry = dict(entry)
+    entry['arrays'] = {key: convert(value) for key, value in entry['arrays'].items()}
+    entry['variants'] = [[convert(value) for value in levels] for levels in entry.get('variants', [])]
+    specs = list(entry['arrays'].values()) + [spec for levels in entry['variants'] for spec in levels]
+    entry['end'] = max(spec_end(spec) for spec in specs)
+    return entry
+
+
+def spec_end(spec: List) -> int:
+    offset, dtype, shape = spec
+    return offset + int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+
+
+def entry_bytes(entry: Dict) -> int:
+    specs = list(entry.get('arrays', {}).values())
+    for levels in entry.get('variants', []):
+        specs.extend(levels)
+    return sum(spec_end(spec) - spec[0] for spec in specs)
+
+
+if __name__ == '__main__':
+    # Предварительная сборка хранилища, например перед упаковкой
+    from detectors import ObjectDetector
+    from constants import TEMPLATES_DIR
+
+    directory = sys.argv[1] if len(sys.argv) > 1 else TEMPLATES_DIR
+    detector = ObjectDetector()
+    detector.load_default_templates(directory)
+    print(f"Шаблонов в хранилище: {len(detector.store.sources())}")
@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+try:
+    from detectors import BarcodeResultCache
+except ImportError as e:
+    # pyzbar без системной библиотеки zbar падает при импорте
+    pytest.skip(f"detectors unavailable: {e}", allow_module_level=True)
+
+
+def code(data='4601234567893', bbox=(10, 10, 40, 20)):
+    x, y, w, h = bbox
+    return {'type': 'EAN13', 'data': data, 'bbox': bbox,
+            'polygon': [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]}
+
+
+def test_code_is_confirmed_after_enough_hits():
+    cache = BarcodeResultCache(confirm_hits=3, ttl=5.0)
+    now = time.time()
+    for i in range(2):
+        assert cache.observe([code()], now=now + i)[0]['confirmed'] is False
+    assert cache.pop_events() == []
+    assert cache.observe([code()], now=now + 2)[0]['confirmed'] is True
+    events = cache.pop_events()
+    assert [(event, detection['data']) for event, detection in events] == [('confirmed', '4601234567893')]
+    # Подтверждение сообщается один раз
+    cache.observe([code()], now=now + 3)
+    assert cache.pop_events() == []
+
+
+def test_tracked_but_undecoded_frames_do_not_count():
+    cache = BarcodeResultCache(confirm_hits=2, ttl=5.0)
+    now = time.time()
+    cache.observe([code()], now=now)
+    cache.observe([code()], decoded=False, now=now + 0.1)
+    assert cache.pop_events() == []
+    cache.observe([code()], now=now + 0.2)
+    assert [event for event, _ in cache.pop_events()] == ['confirmed']
+
+
+def test_different_codes_vote_separately():
+    cache = BarcodeResultCache(confirm_hits=2, ttl=5.0)
+    now = time.time()
+    cache.observe([code('111')], now=now)
+    cache.observe([code('222')], now=now + 0.1)
+    assert cache.pop_events() == []
+
+
+def test_confirmed_code_is_lost_after_ttl():
+    cache = BarcodeResultCache(confirm_hits=1, ttl=1.0)
+    now = time.time()
+    cache.observe([code()], now=now)
+    cache.pop_events()
+    cache.observe([], now=now + 0.5)
+    assert cache.pop_events() == []
+    cache.observe([], now=now + 1.5)
+    assert [event for event, _ in cache.pop_events()] == ['lost']
+    # После потери код снова копит голоса с нуля
+    assert cache.observe([code()], now=now + 2)[0]['confirmed'] is True
+
+
+def test_unconfirmed_code_expires_silently():
+    cache = BarcodeResultCache(confirm_hits=3, ttl=1.0)
+    now = time.time()
+    cache.observe([code()], now=now)
+    cache.observe([], now=now + 2)
+    assert cache.pop_events() == []
+
+
+def test_lookup_region_returns_recent_confirmed_code():
+    cache = BarcodeResultCache(confirm_hits=1, ttl=5.0)
+    now = time.time()
+    assert cache.lookup_region((0, 0, 100, 100), now=now) is None
+    cache.observe([code(bbox=(10, 10, 40, 20))], now=now)
+    assert cache.lookup_region((0, 0, 100, 100), now=now)['data'] == '4601234567893'
+    assert cache.lookup_region((200, 200, 50, 50), now=now) is None
@@ -0,0 +1,80 @@
+import numpy as np
+
+from currency import CurrencyVoteTracker
+
+BOX = (10, 10, 200, 90)
+THUMB = np.zeros((8, 16), np.int16)
+
+
+def vote(tracker, track, nominal, confidence, now):
+    return tracker.observe(track, BOX, THUMB, (nominal, confidence), classified=True, now=now)
+
+
+def confirmed(tracker):
+    return [track.winner[0] for event, track in tracker.pop_events() if event == 'confirmed']
+
+
+def test_winner_needs_minimum_votes():
+    tracker = CurrencyVoteTracker(window=8, margin=1.5, min_votes=3)
+    track, = tracker.match([BOX], [THUMB], now=0.0)
+    assert vote(tracker, track, 100, 0.9, 0.0) is None
+    assert vote(tracker, track, 100, 0.9, 0.1) is None
+    nominal, confidence = vote(tracker, track, 100, 0.9, 0.2)
+    assert nominal == 100
+    assert abs(confidence - 0.9) < 1e-6
+    assert confirmed(tracker) == [100]
+
+
+def test_close_race_is_not_announced():
+    tracker = CurrencyVoteTracker(window=8, margin=1.5, min_votes=3)
+    track, = tracker.match([BOX], [THUMB], now=0.0)
+    for i, nominal in enumerate([100, 500, 100, 500]):
+        assert vote(tracker, track, nominal, 0.9, i * 0.1) is None
+    # Счет 1.8:1.8, затем 2.7:1.8 — разрыв меньше порога 1.5
+    assert vote(tracker, track, 100, 0.9, 0.4) is None
+    assert confirmed(tracker) == []
+    assert vote(tracker, track, 100, 0.9, 0.5)[0] == 100
+    assert confirmed(tracker) == [100]
+
+
+def test_confirmed_once_until_winner_changes():
+    tracker = CurrencyVoteTracker(window=4, margin=1.5, min_votes=3)
+    track, = tracker.match([BOX], [THUMB], now=0.0)
+    for i in range(4):
+        vote(tracker, track, 100, 0.9, i * 0.1)
+    assert confirmed(tracker) == [100]
+    # Окно скользит: голоса за 500 вытесняют старые, победитель меняется один раз
+    winners = [vote(tracker, track, 500, 0.9, 1 + i * 0.1) for i in range(4)]
+    assert winners[-1][0] == 500
+    assert confirmed(tracker) == [500]
+
+
+def test_low_confidence_votes_need_more_frames():
+    tracker = CurrencyVoteTracker(window=8, margin=1.5, min_votes=3)
+    track, = tracker.match([BOX], [THUMB], now=0.0)
+    for i in range(3):
+        assert vote(tracker, track, 100, 0.4, i * 0.1) is None
+    assert vote(tracker, track, 100, 0.4, 0.3)[0] == 100
+
+
+def test_tracks_match_by_overlap_and_expire():
+    tracker = CurrencyVoteTracker(ttl=1.0)
+    first, = tracker.match([BOX], [THUMB], now=0.0)
+    vote(tracker, first, 100, 0.9, 0.0)
+    shifted = (14, 12, 200, 90)
+    far = (400, 300, 200, 90)
+    same, other = tracker.match([shifted, far], [THUMB, THUMB], now=0.5)
+    assert same is first
+    assert other is not first
+    # Трек без наблюдений дольше ttl забывается
+    again, = tracker.match([BOX], [THUMB], now=2.0)
+    assert again is not first
+
+
+def test_clear_drops_tracks_and_events():
+    tracker = CurrencyVoteTracker(min_votes=1, margin=0.5)
+    track, = tracker.match([BOX], [THUMB], now=0.0)
+    vote(tracker, track, 100, 0.9, 0.0)
+    tracker.clear()
+    assert tracker.pop_events() == []
+    assert tracker.match([BOX], [THUMB], now=0.1)[0] is not track
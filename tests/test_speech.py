@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+
+from speech import AudioCache, SpeechQueue
+
+SENTINEL = 'sentinel'
+
+
+def drain(queue):
+    # Сигнальная фраза с наименьшим приоритетом выходит последней: get не блокируется
+    queue.put(SENTINEL, 'ru', 99)
+    texts = []
+    while True:
+        request = queue.get()
+        if request.text == SENTINEL:
+            return texts
+        texts.append(request.text)
+
+
+def test_queue_orders_by_priority_then_arrival():
+    queue = SpeechQueue()
+    queue.put('barcode', 'ru', 2)
+    queue.put('alert', 'ru', 0)
+    queue.put('currency', 'ru', 1)
+    queue.put('alert 2', 'ru', 0)
+    assert drain(queue) == ['alert', 'alert 2', 'currency', 'barcode']
+
+
+def test_queue_coalesces_same_text():
+    queue = SpeechQueue()
+    queue.put('стоп', 'ru', 2)
+    queue.put('переход', 'ru', 2)
+    queue.put('стоп', 'ru', 2)
+    # Повтор заменяет ожидающую фразу и встает в очередь заново
+    assert drain(queue) == ['переход', 'стоп']
+
+
+def test_queue_coalesces_same_key():
+    queue = SpeechQueue()
+    queue.put('100 рублей', 'ru', 1, key='currency')
+    queue.put('код 123', 'ru', 1)
+    queue.put('500 рублей', 'ru', 1, key='currency')
+    assert drain(queue) == ['код 123', '500 рублей']
+
+
+def test_full_queue_preempts_least_important():
+    queue = SpeechQueue(maxsize=2)
+    assert queue.put('first', 'ru', 2)
+    assert queue.put('second', 'ru', 2)
+    # Не важнее худшего ожидающего — отклоняется
+    assert not queue.put('third', 'ru', 2)
+    # Важнее — вытесняет последнее из наименее важных
+    assert queue.put('alert', 'ru', 0)
+    assert queue.get().text == 'alert'
+    assert queue.get().text == 'first'
+    assert drain(queue) == []
+
+
+def test_expired_requests_are_dropped():
+    queue = SpeechQueue()
+    queue.put('stale alert', 'ru', 0, ttl=-1.0)
+    queue.put('fresh', 'ru', 2)
+    assert drain(queue) == ['fresh']
+
+
+def test_close_wakes_waiting_consumer():
+    queue = SpeechQueue()
+    result = []
+    consumer = threading.Thread(target=lambda: result.append(queue.get()))
+    consumer.start()
+    time.sleep(0.05)
+    queue.close()
+    consumer.join(1.0)
+    assert not consumer.is_alive()
+    assert result == [None]
+    assert not queue.put('late', 'ru', 0)
+
+
+def cache_entry(cache, text, size, age=None):
+    temp = cache.temp_path()
+    with open(temp, 'wb') as f:
+        f.write(b'\0' * size)
+    path = cache.put(temp, text, 'ru', 'stub')
+    if age is not None:
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_audio_cache_hit_and_miss(tmp_path):
+    cache = AudioCache(str(tmp_path), budget_bytes=1000)
+    assert cache.get('привет', 'ru', 'stub') is None
+    path = cache_entry(cache, 'привет', 10)
+    assert cache.get('привет', 'ru', 'stub') == path
+    # Ключ включает язык и движок
+    assert cache.get('привет', 'en', 'stub') is None
+    assert cache.get('привет', 'ru', 'gtts') is None
+
+
+def test_audio_cache_evicts_least_recently_used(tmp_path):
+    cache = AudioCache(str(tmp_path), budget_bytes=250)
+    first = cache_entry(cache, 'first', 100, age=30)
+    second = cache_entry(cache, 'second', 100, age=20)
+    # Обращение обновляет отметку: теперь самая старая — second
+    assert cache.get('first', 'ru', 'stub') == first
+    third = cache_entry(cache, 'third', 100)
+    assert os.path.exists(first)
+    assert not os.path.exists(second)
+    assert os.path.exists(third)
+
+
+def test_audio_cache_keeps_new_entry_over_budget(tmp_path):
+    cache = AudioCache(str(tmp_path), budget_bytes=50)
+    old = cache_entry(cache, 'old', 40, age=10)
+    new = cache_entry(cache, 'new', 100)
+    assert not os.path.exists(old)
+    assert os.path.exists(new)
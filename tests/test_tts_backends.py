@@ -0,0 +1,70 @@
+from tts_backends import (BackendSelector, SpeechBackend, FAILURE_PENALTY, SHORT_PHRASE_CHARS)
+
+SHORT = 'стоп'
+LONG = 'x' * (SHORT_PHRASE_CHARS + 1)
+
+
+class FakeBackend(SpeechBackend):
+    def __init__(self, name, local=True, available=True):
+        self.name = name
+        self.local = local
+        self._available = available
+
+    def available(self):
+        return self._available
+
+
+def names(backends):
+    return [backend.name for backend in backends]
+
+
+def make_selector():
+    local = FakeBackend('local')
+    network = FakeBackend('network', local=False)
+    return BackendSelector([network, local]), local, network
+
+
+def test_unavailable_backends_are_skipped():
+    selector = BackendSelector([FakeBackend('missing', available=False), FakeBackend('local')])
+    assert names(selector.ranked(LONG)) == ['local']
+    assert BackendSelector([]).choose(SHORT) is None
+
+
+def test_guesses_prefer_local_before_measurements():
+    selector, _, _ = make_selector()
+    assert names(selector.ranked(LONG)) == ['local', 'network']
+
+
+def test_long_phrases_follow_measured_latency():
+    selector, local, network = make_selector()
+    selector.record(local, 0.8)
+    selector.record(network, 0.3)
+    assert names(selector.ranked(LONG)) == ['network', 'local']
+    # Короткие фразы все равно синтезирует локальный движок
+    assert names(selector.ranked(SHORT)) == ['local', 'network']
+
+
+def test_latency_is_smoothed():
+    selector, local, _ = make_selector()
+    selector.record(local, 1.0)
+    selector.record(local, 2.0)
+    assert 1.0 < selector.latency['local'] < 2.0
+
+
+def test_failure_penalty_demotes_but_keeps_backend():
+    selector, local, _ = make_selector()
+    selector.record_failure(local)
+    assert selector.latency['local'] == FAILURE_PENALTY
+    # Сломанный локальный движок уступает сети даже для коротких фраз,
+    # но остается последним запасным вариантом
+    assert names(selector.ranked(SHORT)) == ['network', 'local']
+    assert names(selector.ranked(LONG)) == ['network', 'local']
+
+
+def test_success_after_failure_restores_short_phrase_priority():
+    selector, local, network = make_selector()
+    selector.record(network, 0.5)
+    selector.record_failure(local)
+    selector.record(local, 0.1)
+    assert selector.latency['local'] < FAILURE_PENALTY
+    assert names(selector.ranked(SHORT)) == ['local', 'network']
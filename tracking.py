@@ -0,0 +1,143 @@
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from preprocess import FrameCache
+
+# Через сколько кадров обязательно делать полную детекцию
+REDETECT_INTERVAL = 10
+# Ниже этой уверенности трекинг считается потерянным
+MIN_TRACK_CONFIDENCE = 0.6
+MAX_TRACK_POINTS = 40
+MIN_TRACK_POINTS = 6
+# Допустимая ошибка прямого и обратного оптического потока, пикселей
+FB_ERROR_THRESHOLD = 1.0
+
+LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+
+class TrackedRegion:
+    __slots__ = ('detection', 'points', 'initial_count')
+
+    def __init__(self, detection: Dict, points: np.ndarray):
+        self.detection = detection
+        self.points = points
+        self.initial_count = len(points)
+
+
+def _track_points(gray: np.ndarray, bbox) -> Optional[np.ndarray]:
+    x, y, w, h = [int(round(v)) for v in bbox]
+    x, y = max(0, x), max(0, y)
+    roi = gray[y:y + h, x:x + w]
+    if roi.shape[0] < 8 or roi.shape[1] < 8:
+        return None
+    corners = cv2.goodFeaturesToTrack(roi, MAX_TRACK_POINTS, 0.01, 3)
+    if corners is None or len(corners) < MIN_TRACK_POINTS:
+        return None
+    return corners.reshape(-1, 1, 2) + np.float32([x, y])
+
+
+def _transform_detection(detection: Dict, matrix: np.ndarray, scale: float) -> Dict:
+    # Переносит рамку и многоугольник детекции по подобию, найденному трекером
+    def apply(px, py):
+        sx, sy = px * scale, py * scale
+        nx = matrix[0, 0] * sx + matrix[0, 1] * sy + matrix[0, 2]
+        ny = matrix[1, 0] * sx + matrix[1, 1] * sy + matrix[1, 2]
+        return int(nx / scale), int(ny / scale)
+
+    x, y, w, h = detection['bbox']
+    corners = [apply(px, py) for px, py in ((x, y), (x + w, y), (x + w, y + h), (x, y + h))]
+    xs = [c[0] for c in corners]
+    ys = [c[1] for c in corners]
+    updated = dict(detection)
+    updated['bbox'] = (min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys))
+    if 'polygon' in detection:
+        updated['polygon'] = [apply(px, py) for px, py in detection['polygon']]
+    updated['tracked'] = True
+    return updated
+
+
+# Детекция с последующим дешевым трекингом: после подтвержденной детекции
+# регионы ведутся оптическим потоком по уменьшенному кадру, а полный детектор
+# запускается раз в N кадров или при падении уверенности трекера
+class DetectThenTrack:
+    def __init__(self, redetect_interval: int = REDETECT_INTERVAL,
+                 min_confidence: float = MIN_TRACK_CONFIDENCE):
+        self.redetect_interval = redetect_interval
+        self.min_confidence = min_confidence
+        self.enabled = True
+        self.confidence = 0.0
+        self.detections_run = 0
+        self.frames_tracked = 0
+        self._tracks: List[TrackedRegion] = []
+        self._prev_gray: Optional[np.ndarray] = None
+        self._since_detect = 0
+
+    def reset(self):
+        self._tracks = []
+        self._prev_gray = None
+        self._since_detect = 0
+        self.confidence = 0.0
+
+    def process(self, cache: FrameCache, detect: Callable[[], List[Dict]]) -> List[Dict]:
+        gray = cache.small_gray
+        detections = None
+
+        if (self.enabled and self._tracks and self._prev_gray is not None
+                and self._prev_gray.shape == gray.shape
+                and self._since_detect < self.redetect_interval):
+            detections = self._track(self._prev_gray, gray, cache.scale)
+
+        if detections is None:
+            detections = detect()
+            self.detections_run += 1
+            self._since_detect = 0
+            self._start_tracks(gray, detections, cache.scale)
+        else:
+            self.frames_tracked += 1
+            self._since_detect += 1
+
+        self._prev_gray = gray
+        return detections
+
+    def _start_tracks(self, gray: np.ndarray, detections: List[Dict], scale: float):
+        self._tracks = []
+        if not self.enabled:
+            return
+        for detection in detections:
+            x, y, w, h = detection['bbox']
+            points = _track_points(gray, (x * scale, y * scale, w * scale, h * scale))
+            if points is None:
+                # Регион без текстуры не ведем: на следующем кадре снова детекция
+                self._tracks = []
+                return
+            self._tracks.append(TrackedRegion(detection, points))
+        self.confidence = 1.0 if self._tracks else 0.0
+
+    def _track(self, prev_gray: np.ndarray, gray: np.ndarray, scale: float) -> Optional[List[Dict]]:
+        results = []
+        confidence = 1.0
+        for track in self._tracks:
+            new_points, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, track.points, None, **LK_PARAMS)
+            back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, new_points, None, **LK_PARAMS)
+            fb_error = np.linalg.norm((track.points - back_points).reshape(-1, 2), axis=1)
+            good = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error < FB_ERROR_THRESHOLD)
+            if good.sum() < MIN_TRACK_POINTS:
+                return None
+
+            matrix, inliers = cv2.estimateAffinePartial2D(track.points[good], new_points[good])
+            if matrix is None:
+                return None
+            inlier_count = int(inliers.sum()) if inliers is not None else int(good.sum())
+            confidence = min(confidence, inlier_count / track.initial_count)
+
+            track.detection = _transform_detection(track.detection, matrix, scale)
+            track.points = new_points[good].reshape(-1, 1, 2)
+            results.append(track.detection)
+
+        self.confidence = confidence
+        if confidence < self.min_confidence:
+            return None
+        return results
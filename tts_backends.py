@@ -0,0 +1,216 @@
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+import wave
+from typing import Dict, List, Optional, Sequence
+
+from constants import IS_ANDROID
+
+
+# Короткие фразы (предупреждения, купюры) всегда синтезирует локальный движок
+SHORT_PHRASE_CHARS = 40
+# Оценки задержки до первого замера, секунд
+LOCAL_LATENCY_GUESS = 0.2
+NETWORK_LATENCY_GUESS = 1.0
+# Сглаживание замеров задержки
+LATENCY_SMOOTHING = 0.3
+# Штраф движку после ошибки: пробуется последним, но не исключается навсегда
+FAILURE_PENALTY = 30.0
+# Явный выбор движка, например VISION_TTS_BACKEND=stub для тестов без сети
+BACKEND_ENV = 'VISION_TTS_BACKEND'
+
+
+# Движок синтеза: превращает текст в аудиофайл, который потом кэшируется
+class SpeechBackend:
+    name = 'base'
+    ext = '.wav'
+    local = True
+
+    def available(self) -> bool:
+        return True
+
+    def synthesize_to_file(self, text: str, lang: str, path: str):
+        raise NotImplementedError
+
+
+class GTTSBackend(SpeechBackend):
+    name = 'gtts'
+    ext = '.mp3'
+    local = False
+
+    def available(self) -> bool:
+        try:
+            import gtts  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def synthesize_to_file(self, text: str, lang: str, path: str):
+        from gtts import gTTS
+        gTTS(text=text, lang=lang, slow=False).save(path)
+
+
+class EspeakBackend(SpeechBackend):
+    name = 'espeak'
+
+    def __init__(self):
+        self.binary = shutil.which('espeak-ng') or shutil.which('espeak')
+
+    def available(self) -> bool:
+        return self.binary is not None
+
+    def synthesize_to_file(self, text: str, lang: str, path: str):
+        subprocess.run([self.binary, '-v', lang, '-w', path, text],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       timeout=10)
+
+
+# Системный синтезатор Android через pyjnius
+class AndroidBackend(SpeechBackend):
+    name = 'android'
+    INIT_TIMEOUT = 3.0
+    SYNTH_TIMEOUT = 10.0
+
+    def __init__(self):
+        self._tts = None
+        self._ready = threading.Event()
+        self._pending: Dict[str, threading.Event] = {}
+        self._listeners = []
+
+    def available(self) -> bool:
+        if not IS_ANDROID:
+            return False
+        try:
+            self._init_engine()
+        except Exception as e:
+            print(f"Android TTS Error: {e}")
+            return False
+        return self._ready.is_set()
+
+    def _init_engine(self):
+        if self._tts is not None:
+            return
+        from jnius import autoclass, PythonJavaClass, java_method
+
+        backend = self
+
+        class InitListener(PythonJavaClass):
+            __javainterfaces__ = ['android/speech/tts/TextToSpeech$OnInitListener']
+            __javacontext__ = 'app'
+
+            @java_method('(I)V')
+            def onInit(self, status):
+                if status == 0:
+                    backend._ready.set()
+
+        class UtteranceListener(PythonJavaClass):
+            __javainterfaces__ = ['android/speech/tts/TextToSpeech$OnUtteranceCompletedListener']
+            __javacontext__ = 'app'
+
+            @java_method('(Ljava/lang/String;)V')
+            def onUtteranceCompleted(self, utterance_id):
+                event = backend._pending.pop(utterance_id, None)
+                if event is not None:
+                    event.set()
+
+        activity = autoclass('org.kivy.android.PythonActivity').mActivity
+        init_listener = InitListener()
+        utterance_listener = UtteranceListener()
+        # Ссылки на слушателей держим, иначе их соберет GC
+        self._listeners = [init_listener, utterance_listener]
+        self._tts = autoclass('android.speech.tts.TextToSpeech')(activity, init_listener)
+        self._ready.wait(self.INIT_TIMEOUT)
+        self._tts.setOnUtteranceCompletedListener(utterance_listener)
+
+    def synthesize_to_file(self, text: str, lang: str, path: str):
+        from jnius import autoclass
+        self._init_engine()
+        self._tts.setLanguage(autoclass('java.util.Locale')(lang))
+        utterance_id = uuid.uuid4().hex
+        done = threading.Event()
+        self._pending[utterance_id] = done
+        params = autoclass('java.util.HashMap')()
+        params.put(autoclass('android.speech.tts.TextToSpeech$Engine').KEY_PARAM_UTTERANCE_ID,
+                   utterance_id)
+        self._tts.synthesizeToFile(text, params, path)
+        if not done.wait(self.SYNTH_TIMEOUT):
+            self._pending.pop(utterance_id, None)
+            raise RuntimeError('Android TTS timeout')
+
+
+# Локальная заглушка: пишет короткую тишину. Нужна для проверки без сети и звука
+class StubBackend(SpeechBackend):
+    name = 'stub'
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    def synthesize_to_file(self, text: str, lang: str, path: str):
+        if self.delay:
+            time.sleep(self.delay)
+        with wave.open(path, 'wb') as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(8000)
+            out.writeframes(b'\0\0' * 800)
+
+
+BACKENDS = {
+    'android': AndroidBackend,
+    'espeak': EspeakBackend,
+    'gtts': GTTSBackend,
+    'stub': StubBackend,
+}
+
+
+def default_backends() -> List[SpeechBackend]:
+    forced = os.environ.get(BACKEND_ENV)
+    if forced:
+        return [BACKENDS[name.strip()]() for name in forced.split(',') if name.strip() in BACKENDS]
+    if IS_ANDROID:
+        return [AndroidBackend(), GTTSBackend()]
+    return [EspeakBackend(), GTTSBackend()]
+
+
+# Выбор движка по доступности и измеренной задержке синтеза
+class BackendSelector:
+    def __init__(self, backends: Sequence[SpeechBackend]):
+        self._candidates = list(backends)
+        self._backends: Optional[List[SpeechBackend]] = None
+        self._lock = threading.Lock()
+        self.latency: Dict[str, float] = {}
+
+    @property
+    def backends(self) -> List[SpeechBackend]:
+        # Проверка доступности может быть медленной (Android TTS), делаем ее лениво
+        with self._lock:
+            if self._backends is None:
+                self._backends = [b for b in self._candidates if b.available()]
+            return self._backends
+
+    def estimate(self, backend: SpeechBackend) -> float:
+        guess = LOCAL_LATENCY_GUESS if backend.local else NETWORK_LATENCY_GUESS
+        return self.latency.get(backend.name, guess)
+
+    def choose(self, text: str) -> Optional[SpeechBackend]:
+        return next(iter(self.ranked(text)), None)
+
+    def ranked(self, text: str) -> List[SpeechBackend]:
+        backends = sorted(self.backends, key=self.estimate)
+        if len(text) <= SHORT_PHRASE_CHARS:
+            # Для коротких фраз исправный локальный движок впереди независимо от замеров
+            backends.sort(key=lambda b: (self.estimate(b) >= FAILURE_PENALTY, not b.local))
+        return backends
+
+    def record(self, backend: SpeechBackend, seconds: float):
+        previous = self.latency.get(backend.name)
+        if previous is None:
+            self.latency[backend.name] = seconds
+        else:
+            self.latency[backend.name] = previous + LATENCY_SMOOTHING * (seconds - previous)
+
+    def record_failure(self, backend: SpeechBackend):
+        self.latency[backend.name] = FAILURE_PENALTY
@@ -0,0 +1,216 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from kivy.graphics import Color, RoundedRectangle
+from kivy.metrics import dp, sp
+from kivy.core.text import DEFAULT_FONT
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
+from kivy.uix.label import Label
+from kivy.uix.togglebutton import ToggleButton
+from kivy.utils import platform
+
+from constants import TEMPLATES_DIR, SUPPORTED_EXTENSIONS
+from pipeline import (MIN_FRAME_INTERVAL, MAX_FRAME_INTERVAL, IDLE_FRAME_INTERVAL, IDLE_AFTER,
+                      PROCESSING_BUDGET)
+
+# Настройка шрифтов
+if platform == 'android':
+    FONT_NAME = 'Roboto'
+    FONT_LIGHT = 'Roboto'
+    FONT_MEDIUM = 'Roboto'
+else:
+    FONT_NAME = DEFAULT_FONT
+    FONT_LIGHT = DEFAULT_FONT
+    FONT_MEDIUM = DEFAULT_FONT
+
+# Оптимизированная цветовая схема
+COLORS = {
+    'background': [0.98, 0.98, 1.0, 1],
+    'surface': [1, 1, 1, 1],
+    'primary': [0.0, 0.6, 0.9, 1],
+    'primary_dark': [0.0, 0.4, 0.7, 1],
+    'success': [0.2, 0.8, 0.4, 1],
+    'warning': [1.0, 0.6, 0.0, 1],
+    'error': [1.0, 0.3, 0.3, 1],
+    'purple': [0.6, 0.4, 0.9, 1],
+    'gold': [1.0, 0.8, 0.2, 1],
+    'card_shadow': [0.0, 0.0, 0.0, 0.1],
+    'card_border': [0.9, 0.95, 1.0, 1],
+    'text_primary': [0.1, 0.2, 0.4, 1],
+    'text_secondary': [0.4, 0.5, 0.7, 1],
+    'text_on_primary': [1, 1, 1, 1],
+}
+
+@dataclass(frozen=True)
+class AppConfig:
+    CAMERA_ID: int = 0
+    # Источник кадров вместо камеры: видео, каталог изображений или сырой дамп.
+    # Переменные окружения VISION_FRAME_SOURCE / VISION_REPLAY_SPEED / VISION_RECORD_DIR
+    # имеют приоритет; скорость 0 — максимальная, кадр за кадром
+    FRAME_SOURCE: Optional[str] = None
+    REPLAY_SPEED: float = 1.0
+    RECORD_DIR: Optional[str] = None
+    # Превью идет с постоянной частотой; регулятор меняет только частоту запуска детектора
+    PREVIEW_INTERVAL: float = 1/30
+    FPS: float = 1/15  # Начальный интервал детектора, дальше его подстраивает регулятор
+    MIN_FRAME_INTERVAL: float = MIN_FRAME_INTERVAL
+    MAX_FRAME_INTERVAL: float = MAX_FRAME_INTERVAL
+    IDLE_FRAME_INTERVAL: float = IDLE_FRAME_INTERVAL
+    IDLE_AFTER: float = IDLE_AFTER
+    PROCESSING_BUDGET: float = PROCESSING_BUDGET
+    # Детекторы в пуле процессов (только desktop): 0 — выключено, -1 — по числу ядер.
+    # Переменная окружения VISION_PROCESS_POOL имеет приоритет
+    PROCESS_POOL_WORKERS: int = 0
+    # Панель замеров поверх превью, если профайлер включен (VISION_PROFILE=1)
+    PROFILE_HUD: bool = True
+    PROFILE_HUD_INTERVAL: float = 0.5
+    OCR_CONFIDENCE_THRESHOLD: float = 0.3
+    TEMPLATES_DIR: str = TEMPLATES_DIR
+    SUPPORTED_EXTENSIONS: tuple = SUPPORTED_EXTENSIONS
+    
+    # Оптимизированные размеры для Android
+    BUTTON_HEIGHT: float = dp(48)
+    BUTTON_HEIGHT_SMALL: float = dp(40)
+    FONT_SIZE: float = sp(14)
+    FONT_SIZE_SMALL: float = sp(12)
+    FONT_SIZE_LARGE: float = sp(16)
+    FONT_SIZE_HEADER: float = sp(18)
+    PADDING: float = dp(8)
+    SPACING: float = dp(5)
+    SPACING_SMALL: float = dp(3)
+    BORDER_RADIUS: float = dp(8)
+    CARD_ELEVATION: float = dp(1)
+
+# Оптимизированная кнопка с кэшированием
+class StyledButton(Button):
+    def __init__(self, color_type='primary', **kwargs):
+        super().__init__(**kwargs)
+        self.size_hint_y = None
+        self.height = AppConfig.BUTTON_HEIGHT
+        self.font_size = AppConfig.FONT_SIZE
+        self.bold = True
+        self.font_name = FONT_MEDIUM
+        self.background_normal = ''
+        self.background_down = ''
+        self.background_color = [0, 0, 0, 0]
+        self.color = COLORS['text_on_primary']
+        self.color_type = color_type
+        self._cached_bg = None
+        self.bind(pos=self._update_gradient, size=self._update_gradient)
+    
+    def _update_gradient(self, *args):
+        if self._cached_bg == (self.x, self.y, self.width, self.height, self.state):
+            return
+        self._cached_bg = (self.x, self.y, self.width, self.height, self.state)
+        
+        self.canvas.before.clear()
+        with self.canvas.before:
+            Color(*COLORS['card_shadow'])
+            RoundedRectangle(pos=(self.x + AppConfig.CARD_ELEVATION, 
+                                 self.y - AppConfig.CARD_ELEVATION),
+                           size=self.size,
+                           radius=[AppConfig.BORDER_RADIUS])
+            
+            color_map = {
+                'success': COLORS['success'],
+                'warning': COLORS['warning'],
+                'error': COLORS['error'],
+                'purple': COLORS['purple'],
+                'gold': COLORS['gold']
+            }
+            Color(*color_map.get(self.color_type, COLORS['primary']))
+            
+            RoundedRectangle(pos=self.pos, size=self.size,
+                           radius=[AppConfig.BORDER_RADIUS])
+            
+            if self.state == 'down':
+                Color(0, 0, 0, 0.1)
+                RoundedRectangle(pos=self.pos, size=self.size,
+                               radius=[AppConfig.BORDER_RADIUS])
+
+class StyledToggleButton(ToggleButton):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.size_hint_y = None
+        self.height = AppConfig.BUTTON_HEIGHT
+        self.font_size = AppConfig.FONT_SIZE
+        self.bold = True
+        self.font_name = FONT_MEDIUM
+        self.background_normal = ''
+        self.background_down = ''
+        self.background_color = [0, 0, 0, 0]
+        self.color = COLORS['text_on_primary']
+        self._cached_bg = None
+        self.bind(pos=self._update_gradient, size=self._update_gradient, 
+                  state=self._update_state)
+    
+    def _update_gradient(self, *args):
+        if self._cached_bg == (self.x, self.y, self.width, self.height, self.state):
+            return
+        self._cached_bg = (self.x, self.y, self.width, self.height, self.state)
+        
+        self.canvas.before.clear()
+        with self.canvas.before:
+            Color(*COLORS['card_shadow'])
+            RoundedRectangle(pos=(self.x + AppConfig.CARD_ELEVATION, 
+                                 self.y - AppConfig.CARD_ELEVATION),
+                           size=self.size,
+                           radius=[AppConfig.BORDER_RADIUS])
+            
+            Color(*COLORS['primary_dark'] if self.state == 'down' else COLORS['primary'])
+            RoundedRectangle(pos=self.pos, size=self.size,
+                           radius=[AppConfig.BORDER_RADIUS])
+    
+    def _update_state(self, *args):
+        self._update_gradient()
+
+class ModernCard(BoxLayout):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.padding = AppConfig.PADDING
+        self.spacing = AppConfig.SPACING
+        self._cached_rect = None
+        self.bind(pos=self._update_rect, size=self._update_rect)
+    
+    def _update_rect(self, *args):
+        if self._cached_rect == (self.x, self.y, self.width, self.height):
+            return
+        self._cached_rect = (self.x, self.y, self.width, self.height)
+        
+        self.canvas.before.clear()
+        with self.canvas.before:
+            Color(*COLORS['card_shadow'])
+            RoundedRectangle(pos=(self.x + AppConfig.CARD_ELEVATION, 
+                                 self.y - AppConfig.CARD_ELEVATION),
+                           size=self.size,
+                           radius=[AppConfig.BORDER_RADIUS])
+            Color(*COLORS['surface'])
+            RoundedRectangle(pos=self.pos, size=self.size,
+                           radius=[AppConfig.BORDER_RADIUS])
+            Color(*COLORS['card_border'])
+            RoundedRectangle(pos=self.pos, size=self.size,
+                           radius=[AppConfig.BORDER_RADIUS], line_width=1)
+
+class ModernLabel(Label):
+    def __init__(self, variant='primary', **kwargs):
+        super().__init__(**kwargs)
+        self.halign = 'left'
+        self.valign = 'top'
+        self.text_size = (None, None)
+        
+        variant_config = {
+            'primary': (COLORS['text_primary'], AppConfig.FONT_SIZE_LARGE, FONT_MEDIUM, True),
+            'secondary': (COLORS['text_secondary'], AppConfig.FONT_SIZE_SMALL, FONT_LIGHT, False),
+            'header': (COLORS['primary'], AppConfig.FONT_SIZE_HEADER, FONT_MEDIUM, True),
+            'success': (COLORS['success'], AppConfig.FONT_SIZE, FONT_MEDIUM, False),
+            'error': (COLORS['error'], AppConfig.FONT_SIZE, FONT_MEDIUM, False)
+        }
+        
+        if variant in variant_config:
+            self.color, self.font_size, self.font_name, self.bold = variant_config[variant]
+        
+        self.bind(size=self._update_text_size)
+    
+    def _update_text_size(self, *args):
+        self.text_size = (self.width - AppConfig.PADDING * 2, None)